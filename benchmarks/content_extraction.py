@@ -0,0 +1,101 @@
+# Content extraction benchmark: runs ContentExtractor over saved HTML pages and reports the LLM input tokens
+# saved per page and the extraction time. If a page `NAME.html` has a `NAME.expected.txt` next to it, holding
+# the article body, the share of its words found in the extracted text (recall) is reported as well.
+# --check first verifies the text of a built-in page, with inline markup inside its paragraphs, failing if its
+# paragraphs aren't each a single line of text, separated by blank lines.
+# Usage: python benchmarks/content_extraction.py [--check] PAGES [PAGES ...]
+import os
+import re
+import sys
+import glob
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vbavatar.content_extractor import ContentExtractor
+from vbavatar.chunking import split_paragraphs
+
+CHECK_PAGE = """<html><head><title>Check</title></head><body><nav><a href="/">Home</a></nav><article>
+<h1>The <em>fox</em> story</h1>
+<p>The <b>quick</b>
+   <a href="/fox">brown fox</a>, jumps over the <em>lazy</em> dog, and keeps on running far into the woods.</p>
+<p>A second paragraph, with <a href="/link">a link</a> and <strong>bold</strong> text<!-- a comment -->, long enough to count.</p>
+<ul><li>One <i>item</i></li><li>Another item</li></ul>
+</article></body></html>"""
+CHECK_PARAGRAPHS = [
+    'The fox story',
+    'The quick brown fox, jumps over the lazy dog, and keeps on running far into the woods.',
+    'A second paragraph, with a link and bold text, long enough to count.',
+    'One item',
+    'Another item',
+]
+
+
+def words(text: str) -> list[str]:
+    return re.findall(r'\w+', text.lower())
+
+
+def recall(expected: str, extracted: str) -> float:
+    expected_words = words(expected)
+    extracted_words = set(words(extracted))
+    return sum(w in extracted_words for w in expected_words) / max(len(expected_words), 1)
+
+
+def check() -> bool:
+    text = ContentExtractor(min_text_length=0).extract(CHECK_PAGE)['text']
+    if text != '\n\n'.join(CHECK_PARAGRAPHS):
+        print(f'Check failed, extracted text: {text!r}')
+        return False
+    chunks = split_paragraphs(text, token_budget=25)
+    if not all(paragraph in CHECK_PARAGRAPHS for chunk in chunks for paragraph in chunk.split('\n\n')):
+        print(f'Check failed, chunks split within paragraphs: {chunks!r}')
+        return False
+    print('Check passed')
+    return True
+
+
+def main() -> int:
+    parser = ArgumentParser()
+    parser.add_argument('pages', nargs='*', help='HTML files or glob patterns')
+    parser.add_argument('--check', action='store_true', help='Verify the text extracted from a built-in page first, failing if it is wrong')
+    args = parser.parse_args()
+
+    if args.check and not check():
+        return 1
+    if args.check and not args.pages:
+        return 0
+    paths = sorted({p for pattern in args.pages for p in glob.glob(pattern)})
+    if not paths:
+        print('No HTML pages found')
+        return 1
+
+    extractor = ContentExtractor()
+    print(f'Parser: {extractor.parser}')
+    total_raw, total_extracted, total_seconds, recalls = 0, 0, 0.0, []
+    for path in paths:
+        with open(path, encoding='utf8', errors='replace') as f:
+            html = f.read()
+        start = time.perf_counter()
+        content = extractor.extract(html)
+        seconds = time.perf_counter() - start
+        total_raw += content['raw_tokens']
+        total_extracted += content['tokens']
+        total_seconds += seconds
+        line = f"{os.path.basename(path)}: {content['raw_tokens']:>7} -> {content['tokens']:>6} tokens | {seconds * 1000:7.1f} ms"
+        expected_path = re.sub(r'\.html?$', '', path) + '.expected.txt'
+        if os.path.exists(expected_path):
+            with open(expected_path, encoding='utf8') as f:
+                recalls.append(recall(f.read(), content['text']))
+            line += f' | recall {recalls[-1]:.1%}'
+        print(line)
+
+    saved = total_raw - total_extracted
+    print(f'Total: {total_raw} -> {total_extracted} tokens, {saved} saved ({saved / max(total_raw, 1):.1%}), '
+          f'{total_seconds / len(paths) * 1000:.1f} ms/page')
+    if recalls:
+        print(f'Mean recall of expected texts: {sum(recalls) / len(recalls):.1%} over {len(recalls)} pages')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
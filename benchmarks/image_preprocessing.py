@@ -0,0 +1,86 @@
+# Image preprocessing benchmark: accuracy vs. speed of cropping, downscaling and tiling the screenshots before
+# OCR (and, with --vlm, before the VLM), on the screenshots and titles of a bundle recorded with `vba --record`.
+# For every setting it reports the OCR time per screenshot, the share of the recorded titles located on the
+# screen, and the share located at the same point (within --tolerance pixels) as without preprocessing.
+# With --vlm, the VLM time and the share of the recorded titles it still finds are reported as well.
+# Needs Florence (torch and transformers), and Ollama for --vlm.
+# Usage: python benchmarks/image_preprocessing.py BUNDLE [--max-sides 1024 768 512] [--tile-height 400] [--vlm]
+import os
+import sys
+import time
+import math
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vbavatar.logger import Logger
+from vbavatar.google_news_reader import GoogleNewsReader
+from vbavatar.image_preprocessing import ImagePreprocessor
+from vbavatar.replay import ReplayBundle
+from vbavatar.screenshot import Screenshot
+from vbavatar.title_matcher import tokenize
+
+
+def same_title(a: str, b: str) -> bool:
+    ta, tb = set(tokenize(a)), set(tokenize(b))
+    return 2 * len(ta & tb) / max(len(ta) + len(tb), 1) >= 0.8
+
+
+def main() -> int:
+    parser = ArgumentParser()
+    parser.add_argument('bundle', help='Fixture bundle directory, recorded with `vba --record`')
+    parser.add_argument('--max-sides', type=int, nargs='*', default=[1024, 768, 512], help='Downscaling sizes to compare (default = 1024 768 512)')
+    parser.add_argument('--tile-height', type=int, default=0, help='Also compare tiling the cropped screenshots to this height (default = 0, no tiling)')
+    parser.add_argument('--tolerance', type=float, default=20, help='Pixels between points to count as the same point (default = 20)')
+    parser.add_argument('--vlm', action='store_true', help='Also time the VLM on the preprocessed screenshots')
+    args = parser.parse_args()
+
+    bundle = ReplayBundle(args.bundle)
+    frames = [(Screenshot.from_file(bundle.path(fr['image'])), fr['titles']) for fr in bundle.frames if fr['titles']]
+    if not frames:
+        print('No recorded screenshots with titles found')
+        return 1
+    Logger().set_level('WARNING')
+    settings: dict[str, ImagePreprocessor | None] = {'full': None, 'crop': ImagePreprocessor()}
+    for side in args.max_sides:
+        settings[f'crop+{side}'] = ImagePreprocessor(max_side=side)
+        if args.tile_height:
+            settings[f'crop+tiles+{side}'] = ImagePreprocessor(max_side=side, tile_height=args.tile_height)
+
+    reader = GoogleNewsReader(memo=False)
+    reader._ocr_and_bounding_boxes(frames[0][0])  # loads Florence before timing
+    reference: dict[tuple[int, str], tuple[int, int]] = {}  # (frame, title) -> point, without preprocessing
+    header = f"{'setting':<18} {'OCR s':>7} {'located':>8} {'same point':>11}" + (f" {'VLM s':>7} {'titles':>7}" if args.vlm else '')
+    print(f'{len(frames)} screenshots, {sum(len(titles) for _, titles in frames)} titles')
+    print(header)
+    print('-' * len(header))
+    for name, preprocessor in settings.items():
+        reader.preprocessor = preprocessor
+        ocr_seconds, vlm_seconds, located, same_point, vlm_found, total = 0.0, 0.0, 0, 0, 0, 0
+        for i, (screenshot, titles) in enumerate(frames):
+            start = time.perf_counter()
+            texts_and_bboxes = reader._filter_ocr_texts_and_bboxes(reader._ocr_and_bounding_boxes(screenshot), min_words=1)
+            ocr_seconds += time.perf_counter() - start
+            points = {match['title']: match['point'] for match in reader.title_matcher.match(titles, texts_and_bboxes)}
+            total += len(titles)
+            located += len(points)
+            for title, point in points.items():
+                if preprocessor is None:
+                    reference[(i, title)] = point
+                elif (i, title) in reference and math.dist(point, reference[(i, title)]) <= args.tolerance:
+                    same_point += 1
+            if args.vlm:
+                start = time.perf_counter()
+                found = reader._titles_from_image(screenshot)
+                vlm_seconds += time.perf_counter() - start
+                vlm_found += sum(any(same_title(title, f) for f in found) for title in titles)
+        if preprocessor is None:
+            same_point = located
+        line = f'{name:<18} {ocr_seconds / len(frames):>7.2f} {located / total:>8.1%} {same_point / max(len(reference), 1):>11.1%}'
+        if args.vlm:
+            line += f' {vlm_seconds / len(frames):>7.2f} {vlm_found / total:>7.1%}'
+        print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
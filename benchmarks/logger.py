@@ -0,0 +1,59 @@
+# Logger benchmark: cost per call of Logger, for records filtered out by the level (debug() at INFO) and for
+# records written out (info(), with and without the JSON-lines output). The time spent by the calling thread is
+# reported separately from the total, which includes the background listener writing the records out.
+# For reference, the cost of inspect.stack(), which the logger used to call for every record, is reported too.
+# Usage: python benchmarks/logger.py [--calls N]
+import os
+import sys
+import time
+import inspect
+import tempfile
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+stdout = sys.stdout
+sys.stdout = open(os.devnull, 'w')  # the console output of the logger is discarded
+from vbavatar.logger import Logger
+
+
+def per_call_ns(func, calls: int) -> float:
+    start = time.perf_counter_ns()
+    for i in range(calls):
+        func(i)
+    return (time.perf_counter_ns() - start) / calls
+
+
+def main() -> int:
+    parser = ArgumentParser()
+    parser.add_argument('--calls', type=int, default=20_000, help='Logging calls per measurement (default = 20000)')
+    args = parser.parse_args()
+
+    logger = Logger()
+    results: list[tuple[str, float, float]] = []
+
+    def measure(name: str, func, calls: int = args.calls) -> None:
+        start = time.perf_counter_ns()
+        caller = per_call_ns(func, calls)
+        logger.flush()
+        results.append((name, caller, (time.perf_counter_ns() - start) / calls))
+
+    logger.set_level('INFO')
+    measure('debug() at INFO (filtered)', lambda i: logger.debug(f'filtered record {i}'))
+    measure('info() at INFO', lambda i: logger.info(f'record {i}'))
+    with tempfile.TemporaryDirectory() as directory:
+        logger.add_json_output(os.path.join(directory, 'log.jsonl'))
+        with logger.context(topic='AI', scroll=1):
+            measure('info() at INFO, JSON lines', lambda i: logger.info(f'record {i}'))
+        logger.flush()
+        measure('inspect.stack() (legacy)', lambda i: inspect.stack(), calls=max(1, args.calls // 100))  # slow
+
+    sys.stdout = stdout
+    print(f"{'call':<30} {'caller ns':>10} {'total ns':>10}")
+    for name, caller, total in results:
+        print(f'{name:<30} {caller:>10,.0f} {total:>10,.0f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
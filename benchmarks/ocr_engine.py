@@ -0,0 +1,82 @@
+# OCR engine benchmark: latency vs. headline hit rate of the Florence inference options (--ocr-engine, --ocr-beams,
+# --ocr-max-tokens), on the screenshots and titles of a bundle recorded with `vba --record`. For every setting it
+# reports the OCR time per screenshot, the share of the recorded titles located on the screen, and the share
+# located at the same point (within --tolerance pixels) as with the current configuration (eager, 3 beams, 1024 tokens).
+# Needs Florence (torch and transformers).
+# Usage: python benchmarks/ocr_engine.py BUNDLE [--engines eager int8] [--beams 3 1] [--max-tokens 1024 512] [--threads N]
+import os
+import sys
+import time
+import math
+import itertools
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vbavatar.logger import Logger
+from vbavatar.florence import Florence
+from vbavatar.google_news_reader import GoogleNewsReader
+from vbavatar.replay import ReplayBundle
+from vbavatar.screenshot import Screenshot
+
+CURRENT = ('eager', 3, 1024)
+
+
+def main() -> int:
+    parser = ArgumentParser()
+    parser.add_argument('bundle', help='Fixture bundle directory, recorded with `vba --record`')
+    parser.add_argument('--engines', type=str, nargs='*', choices=['eager', 'int8'], default=['eager', 'int8'], help='Engines to compare (default = eager int8)')
+    parser.add_argument('--beams', type=int, nargs='*', default=[3, 1], help='Beam counts to compare (default = 3 1)')
+    parser.add_argument('--max-tokens', type=int, nargs='*', default=[1024, 512], help='Token budgets to compare (default = 1024 512)')
+    parser.add_argument('--threads', type=int, default=0, help='CPU threads of the model, 0 lets torch decide (default = 0)')
+    parser.add_argument('--tolerance', type=float, default=20, help='Pixels between points to count as the same point (default = 20)')
+    args = parser.parse_args()
+
+    bundle = ReplayBundle(args.bundle)
+    frames = [(Screenshot.from_file(bundle.path(fr['image'])), fr['titles']) for fr in bundle.frames if fr['titles']]
+    if not frames:
+        print('No recorded screenshots with titles found')
+        return 1
+    Logger().set_level('WARNING')
+    florence = Florence(threads=args.threads or None)
+    reader = GoogleNewsReader(memo=False)
+    reader._ocr_and_bounding_boxes(frames[0][0])  # loads Florence before timing
+
+    # The current configuration goes first, as the reference; int8 last, as quantizing the model can't be undone
+    settings = [CURRENT]
+    for engine in sorted(args.engines, key=lambda e: e == 'int8'):
+        settings += [s for s in itertools.product([engine], args.beams, args.max_tokens) if s != CURRENT]
+
+    reference: dict[tuple[int, str], tuple[int, int]] = {}  # (frame, title) -> point, with the current configuration
+    header = f"{'engine':<7} {'beams':>5} {'tokens':>6} {'OCR s':>7} {'located':>8} {'same point':>11}"
+    print(f'{len(frames)} screenshots, {sum(len(titles) for _, titles in frames)} titles')
+    print(header)
+    print('-' * len(header))
+    for engine, beams, max_tokens in settings:
+        if engine != florence.engine:
+            florence.engine = engine
+            florence._apply_engine()
+            if florence.engine != engine:
+                print(f'{engine} engine is not available on {florence.device}')
+                break
+        florence.num_beams, florence.max_new_tokens = beams, max_tokens
+        ocr_seconds, located, same_point, total = 0.0, 0, 0, 0
+        for i, (screenshot, titles) in enumerate(frames):
+            start = time.perf_counter()
+            texts_and_bboxes = reader._filter_ocr_texts_and_bboxes(reader._ocr_and_bounding_boxes(screenshot), min_words=1)
+            ocr_seconds += time.perf_counter() - start
+            points = {match['title']: match['point'] for match in reader.title_matcher.match(titles, texts_and_bboxes)}
+            total += len(titles)
+            located += len(points)
+            for title, point in points.items():
+                if (engine, beams, max_tokens) == CURRENT:
+                    reference[(i, title)] = point
+                elif (i, title) in reference and math.dist(point, reference[(i, title)]) <= args.tolerance:
+                    same_point += 1
+        if (engine, beams, max_tokens) == CURRENT:
+            same_point = located
+        print(f'{engine:<7} {beams:>5} {max_tokens:>6} {ocr_seconds / len(frames):>7.2f} {located / total:>8.1%} {same_point / max(len(reference), 1):>11.1%}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
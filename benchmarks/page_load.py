@@ -0,0 +1,103 @@
+# Page load benchmark: time to fetch article pages with the async engine, with and without blocking heavy
+# resources and trackers (--no-block-requests), and waiting for `load` or only for `domcontentloaded` (--wait-until).
+# Heavy fixture pages are served by a local HTTP server: each has images, a font, a video and a tracker script,
+# all served after a delay. The tracker is served from `localhost`, which is added to the tracker domains here,
+# while the pages are served from 127.0.0.1. Reports the fetch time per page, the resource requests the server
+# answered, the requests the browser blocked, and whether the article text was in every fetched HTML.
+# Needs Playwright's Chromium (`playwright install chromium`).
+# Usage: python benchmarks/page_load.py [--pages 12] [--images 20] [--delay 0.3] [--max-tabs 4]
+import os
+import sys
+import time
+import threading
+from argparse import ArgumentParser
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vbavatar.logger import Logger
+from vbavatar.browser import RequestFilter
+from vbavatar.article_fetcher import AsyncArticleFetcher
+
+ARTICLE_MARKER = 'The fixture article text is here'
+CONTENT_TYPES = {'img': 'image/jpeg', 'font': 'font/woff2', 'video': 'video/mp4', 'tracker': 'application/javascript'}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # /article/<i>.html is served at once; its resources (/img, /font, /video, /tracker) after `delay` seconds
+    port: int
+    images: int
+    resource_kb: int
+    delay: float
+    served: Counter
+    lock = threading.Lock()
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _article(self, i: str) -> bytes:
+        images = ''.join(f'<img src="/img/{i}/{k}.jpg" width="400" height="300">' for k in range(self.images))
+        return f"""<!DOCTYPE html><html><head><title>Fixture article {i}</title>
+<style>@font-face {{ font-family: Fixture; src: url(/font/{i}.woff2); }} body {{ font-family: Fixture; }}</style>
+<script src="http://localhost:{self.port}/tracker/{i}.js"></script></head>
+<body><article><h1>Fixture article {i}</h1><p>{ARTICLE_MARKER}.</p>{images}
+<video src="/video/{i}.mp4" autoplay muted></video></article></body></html>""".encode()
+
+    def do_GET(self) -> None:
+        kind = self.path.split('/')[1]
+        if kind == 'article':
+            body, content_type = self._article(self.path.split('/')[2].split('.')[0]), 'text/html'
+        elif kind in CONTENT_TYPES:
+            time.sleep(self.delay)
+            body, content_type = b'\0' * (self.resource_kb * 1024), CONTENT_TYPES[kind]
+            if kind == 'tracker': body = b'/* tracker */'
+        else:
+            self.send_error(404)
+            return
+        with self.lock:
+            self.served[kind] += 1
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main() -> int:
+    parser = ArgumentParser()
+    parser.add_argument('--pages', type=int, default=12, help='Article pages to fetch per setting (default = 12)')
+    parser.add_argument('--images', type=int, default=20, help='Images on each page (default = 20)')
+    parser.add_argument('--resource-kb', type=int, default=200, help='Size of each image, font and video (default = 200)')
+    parser.add_argument('--delay', type=float, default=0.3, help='Seconds before each resource is served (default = 0.3)')
+    parser.add_argument('--max-tabs', type=int, default=4, help='Article tabs loading at once (default = 4)')
+    args = parser.parse_args()
+
+    Logger().set_level('WARNING')
+    RequestFilter.TRACKER_DOMAINS += ('localhost',)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    server.daemon_threads = True
+    FixtureHandler.port = server.server_address[1]
+    FixtureHandler.images, FixtureHandler.resource_kb, FixtureHandler.delay = args.images, args.resource_kb, args.delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f'http://127.0.0.1:{FixtureHandler.port}/article/{i}.html' for i in range(args.pages)]
+
+    header = f"{'wait until':<17} {'block':>5} {'s/page':>7} {'served':>7} {'blocked':>8} {'text':>5}"
+    print(header)
+    print('-' * len(header))
+    for wait_until in ['load', 'domcontentloaded']:
+        for block_requests in [False, True]:
+            FixtureHandler.served = Counter()
+            with AsyncArticleFetcher(max_tabs=args.max_tabs, headless=True, block_requests=block_requests, wait_until=wait_until) as fetcher:  # pyright: ignore[reportArgumentType]
+                start = time.perf_counter()
+                pages = fetcher.fetch_all(urls)
+                seconds = time.perf_counter() - start
+                blocked = fetcher._browser.blocked_requests
+            served = sum(count for kind, count in FixtureHandler.served.items() if kind != 'article')
+            text = len(pages) == len(urls) and all(ARTICLE_MARKER in html for _, html in pages)
+            print(f'{wait_until:<17} {"yes" if block_requests else "no":>5} {seconds / len(urls):>7.2f} {served:>7} {blocked:>8} {"ok" if text else "MISS":>5}')
+    server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
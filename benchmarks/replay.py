@@ -0,0 +1,229 @@
+# Replay benchmark: replays a fixture bundle recorded with `vba --record DIR` offline. Screenshots go through
+# the analysis pipeline of GoogleNewsReader (titles -> OCR), with the recorded OCR outputs standing in for
+# Florence; article pages are served by a local static HTTP server and go through fetching and NewsPageScraper
+# cleaning. Ollama is replaced by a deterministic stub, answering with the recorded titles and echoing texts to
+# clean, after a simulated latency. Reports per-stage throughput, latency percentiles and peak RSS, and compares
+# them against a baseline saved by a previous replay, failing on regressions beyond the threshold.
+# With --ocr-latency, the recorded OCR outputs are answered after a delay too, and --concurrent-analysis runs the
+# VLM and OCR at once, as a single `analysis` stage. --stream-cleaning streams the cleaned texts from the stub,
+# reporting how long the first part of each article took.
+# Usage: python benchmarks/replay.py BUNDLE [--save-baseline FILE] [--baseline FILE] [--threshold 0.2]
+import io
+import os
+import sys
+import json
+import time
+import base64
+import resource
+import threading
+import urllib.request
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PIL import Image
+from vbavatar.logger import Logger
+from vbavatar.tracing import Tracer
+from vbavatar.model_gateway import ModelGateway
+from vbavatar.fingerprint import FingerprintMemo, dhash
+from vbavatar.google_news_reader import GoogleNewsReader
+from vbavatar.pipeline import Pipeline, Stage
+from vbavatar.replay import ReplayBundle, ReplayOcr
+from vbavatar.screenshot import Screenshot
+from vbavatar.types_ import ScreenshotFrame
+from vbavatar.utils import estimate_tokens
+
+STAGES = ['titles', 'ocr', 'analysis', 'fetch', 'cleaning']
+MIN_LATENCY_DELTA_S = 0.01  # latency changes below this are noise, whatever their relative size
+
+
+class QuietStaticHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    # Answers /api/chat like Ollama would: vision requests with the titles recorded for the screenshot,
+    # text requests by echoing the text, taking `latency + tokens / tokens_per_second` seconds
+    bundle: ReplayBundle
+    latency: float
+    tokens_per_second: float
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _respond(self, chunks: list[dict[str, Any]]) -> None:
+        body = b''.join(json.dumps(chunk).encode() + b'\n' for chunk in chunks)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _answer(self, message: dict[str, Any]) -> str:
+        if message.get('images'):
+            frame = self.bundle.frame_of(Image.open(io.BytesIO(base64.b64decode(message['images'][0]))))
+            return json.dumps({'titles': (frame or {}).get('titles') or []})
+        return message.get('content', '')
+
+    def do_POST(self) -> None:
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        message = (request.get('messages') or [{}])[-1]
+        content = self._answer(message) if self.path == '/api/chat' else ''
+        prompt_tokens, tokens = estimate_tokens(message.get('content', '')), estimate_tokens(content)
+        time.sleep(self.latency + tokens / self.tokens_per_second)
+        done = {'model': request.get('model', ''), 'done': True, 'done_reason': 'stop',
+                'prompt_eval_count': prompt_tokens, 'eval_count': tokens}
+        if self.path == '/api/chat':
+            reply = {'role': 'assistant', 'content': content}
+            if request.get('stream', True):
+                words = content.split(' ')
+                parts = [{'model': done['model'], 'done': False,
+                          'message': {'role': 'assistant', 'content': w + (' ' if i < len(words) - 1 else '')}}
+                         for i, w in enumerate(words)]
+                self._respond(parts + [{**done, 'message': {'role': 'assistant', 'content': ''}}])
+            else:
+                self._respond([{**done, 'message': reply}])
+        else:  # /api/generate, as used for warming up
+            self._respond([{**done, 'response': ''}])
+
+
+def serve(handler: Any) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def stage_report(tracer: Tracer) -> dict[str, dict[str, float]]:
+    report: dict[str, dict[str, float]] = {}
+    for stage in STAGES:
+        spans = [s for s in tracer.spans if s.name == f'stage:{stage}']
+        if not spans: continue
+        seconds = [s.seconds for s in spans]
+        wall = (max(s.end_ns for s in spans) - min(s.start_ns for s in spans)) / 1e9
+        report[stage] = {
+            'count': len(spans),
+            'throughput': len(spans) / max(wall, 1e-9),  # items per second, while the stage was busy
+            'p50_s': percentile(seconds, 0.5),
+            'p95_s': percentile(seconds, 0.95),
+            'p99_s': percentile(seconds, 0.99),
+        }
+    return report
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024  # bytes on macOS, kilobytes on Linux
+
+
+def compare(result: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    regressions: list[str] = []
+    for stage, metrics in result['stages'].items():
+        base = baseline['stages'].get(stage)
+        if not base: continue
+        if metrics['throughput'] < base['throughput'] * (1 - threshold):
+            regressions.append(f"{stage}: throughput {metrics['throughput']:.2f}/s < baseline {base['throughput']:.2f}/s")
+        for key in ('p50_s', 'p95_s'):
+            if metrics[key] > base[key] * (1 + threshold) and metrics[key] - base[key] > MIN_LATENCY_DELTA_S:
+                regressions.append(f'{stage}: {key} {metrics[key]:.3f} > baseline {base[key]:.3f}')
+    if result['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + threshold):
+        regressions.append(f"peak RSS {result['peak_rss_mb']:.0f} MB > baseline {baseline['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def replay(bundle: ReplayBundle, static_url: str, *, iterations: int, threads: int, ocr_latency: float, concurrent_analysis: bool, stream_cleaning: bool) -> None:
+    reader = GoogleNewsReader(browser_context=None, memo=False, stream_cleaning=stream_cleaning)  # pyright: ignore[reportArgumentType]
+    reader.florence = ReplayOcr(bundle, latency=ocr_latency)  # pyright: ignore[reportAttributeAccessIssue]
+    ocr_executor = ThreadPoolExecutor(max_workers=1)
+    if concurrent_analysis:
+        analysis_stages = [Stage('analysis', lambda frame: reader._analyze_frame(frame, ocr_executor))]
+    else:
+        analysis_stages = [Stage('titles', reader._detect_titles), Stage('ocr', reader._locate_titles)]
+
+    def fetch(page: dict[str, Any]) -> tuple[str, str]:
+        with urllib.request.urlopen(f"{static_url}/{page['file']}") as response:
+            return page['url'], response.read().decode('utf8', errors='replace')
+
+    for _ in range(iterations):
+        reader.analysis_memo = FingerprintMemo()  # every iteration analyzes all screenshots again
+        with Pipeline(analysis_stages, name='replay:analysis') as analysis:
+            for fr in bundle.frames:
+                screenshot = Screenshot.from_file(bundle.path(fr['image']))
+                analysis.put(ScreenshotFrame(scroll=fr['scroll'], screenshot=screenshot, scroll_y=0,
+                                             fingerprint=dhash(screenshot.image), titles=[], points=[]))
+            list(analysis.drain())
+        with Pipeline([Stage('fetch', fetch, workers=threads), Stage('cleaning', reader._clean_page, workers=threads)],
+                      maxsize=threads, name='replay:cleaning') as cleaning:
+            for page in bundle.pages:
+                cleaning.put(page)
+            list(cleaning.drain())
+    ocr_executor.shutdown()
+
+
+def main() -> int:
+    parser = ArgumentParser()
+    parser.add_argument('bundle', help='Fixture bundle directory, recorded with `vba --record`')
+    parser.add_argument('--iterations', type=int, default=1, help='Times to replay the bundle (default = 1)')
+    parser.add_argument('--threads', type=int, default=3, help='Fetching and cleaning workers (default = 3)')
+    parser.add_argument('--model-latency', type=float, default=0.05, help='Seconds the stub models take per request (default = 0.05)')
+    parser.add_argument('--tokens-per-second', type=float, default=2000, help='Output tokens per second of the stub models (default = 2000)')
+    parser.add_argument('--ocr-latency', type=float, default=0, help='Seconds the stub OCR takes per screenshot (default = 0)')
+    parser.add_argument('--concurrent-analysis', action='store_true', help='Run the VLM and OCR on each screenshot at once, as `vba --concurrent-analysis`')
+    parser.add_argument('--stream-cleaning', action='store_true', help='Stream the cleaned texts, as `vba --stream-cleaning`')
+    parser.add_argument('--save-baseline', type=str, default='', help='Save the results as a baseline to this file')
+    parser.add_argument('--baseline', type=str, default='', help='Compare the results to the baseline in this file, failing on regressions')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Relative change of a metric to count as a regression (default = 0.2)')
+    args = parser.parse_args()
+
+    bundle = ReplayBundle(args.bundle)
+    print(f'Bundle: {len(bundle.frames)} screenshots, {len(bundle.pages)} pages')
+    Logger().set_level('WARNING')
+    handler = type('Handler', (StubOllamaHandler,), {'bundle': bundle, 'latency': args.model_latency, 'tokens_per_second': args.tokens_per_second})
+    ollama_server = serve(handler)
+    static_server = serve(partial(QuietStaticHandler, directory=bundle.directory))
+    ModelGateway(host=f'http://127.0.0.1:{ollama_server.server_port}')
+    tracer = Tracer()
+    tracer.enable()
+
+    start = time.perf_counter()
+    try:
+        replay(bundle, f'http://127.0.0.1:{static_server.server_port}', iterations=args.iterations, threads=args.threads,
+               ocr_latency=args.ocr_latency, concurrent_analysis=args.concurrent_analysis, stream_cleaning=args.stream_cleaning)
+    finally:
+        ollama_server.shutdown()
+        static_server.shutdown()
+    result = {'stages': stage_report(tracer), 'peak_rss_mb': peak_rss_mb(), 'wall_s': time.perf_counter() - start}
+
+    print(f"{'stage':<10} {'count':>6} {'items/s':>9} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8}")
+    for stage, m in result['stages'].items():
+        print(f"{stage:<10} {m['count']:>6.0f} {m['throughput']:>9.2f} {m['p50_s']:>8.3f} {m['p95_s']:>8.3f} {m['p99_s']:>8.3f}")
+    first_text = [s.attrs['first_text_seconds'] for s in tracer.spans if 'first_text_seconds' in s.attrs]
+    if first_text:
+        print(f'First cleaned text: p50 {percentile(first_text, 0.5):.3f}s, p95 {percentile(first_text, 0.95):.3f}s')
+    print(f"Wall time: {result['wall_s']:.2f}s | peak RSS: {result['peak_rss_mb']:.0f} MB")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(result, f, indent=1)
+        print(f'Saved baseline: {args.save_baseline}')
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions: return 1
+        print(f'No regressions beyond {args.threshold:.0%} of the baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+# Startup benchmark: measures the import time of the CLI and the wall-time of `vba --help`,
+# and fails if either regresses beyond the given limits, or if heavy libraries are imported eagerly.
+# Usage: python benchmarks/startup.py [--runs N] [--max-import-ms MS] [--max-help-ms MS]
+import os
+import sys
+import time
+import statistics
+import subprocess
+from argparse import ArgumentParser
+
+HEAVY_MODULES = ['torch', 'transformers', 'numpy', 'PIL', 'ollama', 'bs4', 'playwright']
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHECK_EAGER_IMPORTS = f"""
+import sys
+import vbavatar.__main__
+eager = [m for m in {HEAVY_MODULES!r} if m in sys.modules and not type(sys.modules[m]).__name__.startswith('_Lazy')]
+print(','.join(eager))
+"""
+
+
+def _python(*args: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([REPO_ROOT, os.environ.get('PYTHONPATH', '')]))
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, env=env, check=True)
+
+
+def import_time_ms() -> float:
+    # -X importtime reports cumulative microseconds per module on stderr; the package's own line holds the total
+    stderr = _python('-X', 'importtime', '-c', 'import vbavatar.__main__').stderr
+    for line in stderr.splitlines():
+        parts = [p.strip() for p in line.split('|')]
+        if len(parts) == 3 and parts[2] == 'vbavatar.__main__':
+            return int(parts[1]) / 1000
+    raise RuntimeError(f'vbavatar.__main__ not found in import-time report:\n{stderr}')
+
+
+def help_time_ms() -> float:
+    start = time.perf_counter()
+    _python('-m', 'vbavatar', '--help')
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> int:
+    parser = ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5, help='Number of measurements per metric (default = 5)')
+    parser.add_argument('--max-import-ms', type=float, default=150, help='Maximal median import time of the CLI module (default = 150)')
+    parser.add_argument('--max-help-ms', type=float, default=500, help='Maximal median wall-time of `vba --help` (default = 500)')
+    args = parser.parse_args()
+
+    eager = _python('-c', CHECK_EAGER_IMPORTS).stdout.strip()
+    import_ms = statistics.median(import_time_ms() for _ in range(args.runs))
+    help_ms = statistics.median(help_time_ms() for _ in range(args.runs))
+
+    print(f'Import time of vbavatar.__main__: {import_ms:.1f} ms (limit {args.max_import_ms:.0f} ms)')
+    print(f'Wall-time of `vba --help`:       {help_ms:.1f} ms (limit {args.max_help_ms:.0f} ms)')
+    print(f'Heavy modules imported eagerly:   {eager or "none"}')
+
+    failed = bool(eager) or import_ms > args.max_import_ms or help_ms > args.max_help_ms
+    if failed: print('REGRESSION')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
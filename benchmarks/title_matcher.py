@@ -0,0 +1,93 @@
+# Title matcher benchmark: replays recorded OCR outputs (saved as DEBUG_ocr_*.json by `vba --debug`)
+# through the legacy substring matcher and TitleMatcher, and reports speed and accuracy of both. A match is
+# correct if the box it clicks is a line of the matched title: at least 3 words (or the whole title), of which
+# at least 80% are in the title, and in no other title as much. Matches clicking anywhere else count as wrong.
+# Usage: python benchmarks/title_matcher.py [RECORDS ...] [--repeat N]
+import os
+import sys
+import glob
+import json
+import time
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vbavatar.title_matcher import TitleMatcher, bbox_center, tokenize
+
+TextsAndBBoxes = list[tuple[str, list[float]]]
+MIN_LINE_WORDS = 3
+MIN_WORDS_IN_TITLE = 0.8
+
+
+def legacy_match(titles: list[str], texts_and_bboxes: TextsAndBBoxes) -> list[tuple[str, tuple[int, int]]]:
+    # The matcher GoogleNewsReader used before TitleMatcher, including its filter of short texts
+    texts_and_bboxes = [(text, bbox) for text, bbox in texts_and_bboxes if len([w for w in text.split(' ') if w]) > 2]
+    where_to_click: list[tuple[str, tuple[int, int]]] = []
+    for title in titles:
+        indices = [i for i, (text, _) in enumerate(texts_and_bboxes) if text.lower() in title.lower()]
+        if indices:
+            where_to_click.append((title, bbox_center(texts_and_bboxes[indices[0]][1])))
+    return where_to_click
+
+
+def title_lines(titles: list[str], texts_and_bboxes: TextsAndBBoxes) -> dict[str, list[list[float]]]:
+    # The boxes of each title's lines, the known-correct places to click it
+    lines: dict[str, list[list[float]]] = {title: [] for title in titles}
+    for text, bbox in texts_and_bboxes:
+        tokens = tokenize(text)
+        best_title, best_share = None, 0.0
+        for title in titles:
+            title_tokens = set(tokenize(title))
+            share = sum(token in title_tokens for token in tokens) / max(len(tokens), 1)
+            if len(tokens) >= min(MIN_LINE_WORDS, len(title_tokens)) and share >= MIN_WORDS_IN_TITLE and share > best_share:
+                best_title, best_share = title, share
+        if best_title is not None:
+            lines[best_title].append(bbox)
+    return lines
+
+
+def is_inside(point: tuple[int, int], bbox: list[float]) -> bool:
+    xs, ys = bbox[0::2], bbox[1::2]
+    return min(xs) <= point[0] <= max(xs) and min(ys) <= point[1] <= max(ys)
+
+
+def main() -> int:
+    parser = ArgumentParser()
+    parser.add_argument('records', nargs='*', default=[os.path.join('cache', '*', 'DEBUG_ocr_*.json')], help='Recorded OCR files or glob patterns (default = cache/*/DEBUG_ocr_*.json)')
+    parser.add_argument('--repeat', type=int, default=100, help='Number of times each record is matched, for timing (default = 100)')
+    args = parser.parse_args()
+
+    paths = sorted({p for pattern in args.records for p in glob.glob(pattern)})
+    if not paths:
+        print('No recorded OCR outputs found, run `vba --debug` to record some')
+        return 1
+    records: list[tuple[list[str], TextsAndBBoxes]] = []
+    for path in paths:
+        with open(path) as f:
+            record = json.load(f)
+        records.append((record['titles'], [(text, bbox) for text, bbox in record['texts_and_bboxes']]))
+    total_titles = sum(len(titles) for titles, _ in records)
+    print(f'{len(records)} screenshots, {total_titles} titles, {sum(len(b) for _, b in records)} OCR boxes')
+
+    matcher = TitleMatcher()
+    matchers = {
+        'legacy': lambda titles, boxes: legacy_match(titles, boxes),
+        'TitleMatcher': lambda titles, boxes: [(m['title'], m['point']) for m in matcher.match(titles, boxes)],
+    }
+    lines = [title_lines(titles, boxes) for titles, boxes in records]
+    for name, match in matchers.items():
+        hits, wrong = 0, 0
+        for (titles, boxes), record_lines in zip(records, lines):
+            for title, point in match(titles, boxes):
+                if any(is_inside(point, bbox) for bbox in record_lines[title]): hits += 1
+                else: wrong += 1
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for titles, boxes in records:
+                match(titles, boxes)
+        per_screenshot_us = (time.perf_counter() - start) / (args.repeat * len(records)) * 1e6
+        print(f'{name:>14}: {per_screenshot_us:9.1f} us/screenshot | correct {hits}/{total_titles} = {hits / max(total_titles, 1):.1%} | wrong {wrong}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,31 +1,144 @@
 import os
-import json
 from datetime import datetime
 from argparse import ArgumentParser
+from contextlib import ExitStack
 from .logger import Logger
-from .browser import Browser
-from .google_news_reader import GoogleNewsReader
+from .jsonl_writer import JsonlWriter, PartialTextWriter
+from .tracing import Tracer
 
 
 def run():
     parser = ArgumentParser()
     parser.add_argument('-s', '--scrolls', type=int, dest='scrolls', help='Number of mouse-scrolls to perform (non-negative integer, default = 1)', default=1, required=False)
-    parser.add_argument('-o', '--output-file', type=str, default='', dest='output_file', help='Output filename (defaults to `output_[run-time].json`)', required=False)
+    parser.add_argument('-t', '--topics', type=str, nargs='+', default=['AI'], dest='topics', help='Topics to read: names of known topics (AI, Technology, Science, Business, World, Health) or NAME=URL of any Google News page (default = AI)', required=False)
+    parser.add_argument('--parallel-topics', type=int, default=3, dest='parallel_topics', help='Maximal number of topics read at once, each in a browser of its own (default = 3)', required=False)
+    parser.add_argument('-o', '--output-file', type=str, default='', dest='output_file', help='Output filename, written as JSON lines (defaults to `output_[run-time].jsonl`)', required=False)
+    parser.add_argument('--resume', type=str, default='', dest='resume', help='Partial output file of a previous run to continue: its articles are skipped, and new ones are appended to it', required=False)
+    parser.add_argument('--no-memo', action='store_false', dest='memo', help='Do not reuse cleaned article texts from previous runs', required=False, default=True)
+    parser.add_argument('--no-extract', action='store_false', dest='extract_content', help='Send the full page text to the LLM, instead of only the main content', required=False, default=True)
+    parser.add_argument('--stream-cleaning', action='store_true', dest='stream_cleaning', help='Stream the text model\'s output while cleaning articles, writing the text of each article to `[output-file].partial.jsonl` line by line as it is generated, before the article is written to the output file', required=False, default=False)
+    parser.add_argument('--no-url-index', action='store_false', dest='url_index', help='Do not skip articles which were already harvested in previous runs', required=False, default=True)
+    parser.add_argument('--url-ttl-hours', type=float, default=72, dest='url_ttl_hours', help='Hours after which a harvested article may be harvested again (default = 72)', required=False)
+    parser.add_argument('--engine', type=str, choices=['async', 'sync'], default='async', dest='engine', help='Browser engine for loading articles: `async` loads them concurrently in several tabs, `sync` clicks them one by one (default = async)', required=False)
+    parser.add_argument('--max-tabs', type=int, default=4, dest='max_tabs', help='Maximal number of article tabs open at once, loading with the async engine or left open by clicking with the sync engine (default = 4)', required=False)
+    parser.add_argument('--recycle-after', type=int, default=50, dest='recycle_after', help='Articles loaded in a browser context of the async engine before it is replaced by a fresh one, 0 never replaces it (default = 50)', required=False)
+    parser.add_argument('--page-timeout', type=float, default=30, dest='page_timeout', help='Seconds to wait for an article page to load with the async engine (default = 30)', required=False)
+    parser.add_argument('--wait-until', type=str, choices=['load', 'domcontentloaded'], default='load', dest='wait_until', help='When the HTML of an article page is taken: once it fully loaded, or once its DOM is ready (default = load)', required=False)
+    parser.add_argument('--headless', action='store_true', dest='headless', help='Run the browsers without showing their windows', required=False, default=False)
+    parser.add_argument('--no-block-requests', action='store_false', dest='block_requests', help='Let article pages load images, media, fonts and ad/tracker requests, which are blocked by default', required=False, default=True)
+    parser.add_argument('--vlm-concurrency', type=int, default=1, dest='vlm_concurrency', help='Maximal number of concurrent requests to the vision model (default = 1)', required=False)
+    parser.add_argument('--llm-concurrency', type=int, default=2, dest='llm_concurrency', help='Maximal number of concurrent requests to the text model (default = 2)', required=False)
+    parser.add_argument('--max-inference', type=int, default=3, dest='max_inference', help='Maximal number of model calls running at once, across the vision, text and OCR models (default = 3)', required=False)
+    parser.add_argument('--ocr-workers', type=int, default=0, dest='ocr_workers', help='Number of dedicated OCR worker processes, 0 runs OCR in-process (default = 0)', required=False)
+    parser.add_argument('--ocr-batch', type=int, default=4, dest='ocr_batch', help='Maximal number of screenshots an OCR worker process runs as one batch (default = 4)', required=False)
+    parser.add_argument('--ocr-engine', type=str, choices=['eager', 'int8'], default='eager', dest='ocr_engine', help='Florence inference engine: `eager` runs the fp32 model, `int8` quantizes its linear layers (CPU only) (default = eager)', required=False)
+    parser.add_argument('--ocr-beams', type=int, default=3, dest='ocr_beams', help='Beams of the OCR beam search, 1 decodes greedily (default = 3)', required=False)
+    parser.add_argument('--ocr-max-tokens', type=int, default=1024, dest='ocr_max_tokens', help='Maximal number of tokens the OCR model generates per screenshot (default = 1024)', required=False)
+    parser.add_argument('--ocr-threads', type=int, default=0, dest='ocr_threads', help='Number of CPU threads of the OCR model (of each OCR worker process, with --ocr-workers), 0 lets torch decide (default = 0)', required=False)
+    parser.add_argument('--concurrent-analysis', action='store_true', dest='concurrent_analysis', help='Run the vision model and OCR on each screenshot at once, each cancelling the other if it finds nothing', required=False, default=False)
+    parser.add_argument('--crop', action='store_true', dest='crop', help='Crop the Google News top bar and the page margins off the screenshots before the models see them', required=False, default=False)
+    parser.add_argument('--max-image-side', type=int, default=0, dest='max_image_side', help='Downscale the screenshots so neither side is longer than this before the models see them, 0 keeps their size (default = 0)', required=False)
+    parser.add_argument('--tile-height', type=int, default=0, dest='tile_height', help='Cut screenshots taller than this into overlapping tiles for OCR, 0 does not tile (default = 0)', required=False)
+    parser.add_argument('--keep-alive', type=str, default='30m', dest='keep_alive', help='How long Ollama keeps the models loaded after the last request (default = 30m)', required=False)
+    parser.add_argument('--record', type=str, default='', dest='record', help='Directory to record the screenshots, model outputs and article pages of the run to, as a fixture bundle for benchmarks/replay.py', required=False)
+    parser.add_argument('--cache-max-mb', type=float, default=1024, dest='cache_max_mb', help='Disk space the artifacts of all runs in the cache directory may take, least recently used ones are evicted first, 0 for no limit (default = 1024)', required=False)
+    parser.add_argument('--cache-max-age-days', type=float, default=14, dest='cache_max_age_days', help='Days after which artifacts in the cache directory are evicted, 0 for no limit (default = 14)', required=False)
+    parser.add_argument('--save-screenshots', action='store_true', dest='save_screenshots', help='Write the screenshots to the cache directory, instead of only keeping them in memory (always on with --debug)', required=False, default=False)
+    parser.add_argument('--profile', action='store_true', dest='profile', help='Trace the run stages, exporting a Chrome trace-event file next to the output file and logging a summary table', required=False, default=False)
+    parser.add_argument('--log-json', type=str, default='', dest='log_json', help='Also write the logs to this file as JSON lines, with the run, topic, scroll and article of each record', required=False)
     parser.add_argument('--debug', action='store_true', dest='debug', help='Turn on debug mode', required=False, default=False)
     args = parser.parse_args()
 
     logger = Logger()
     logger.set_level('DEBUG' if args.debug else 'INFO')
+    logger.run_id = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    if args.log_json: logger.add_json_output(args.log_json)
+    tracer = Tracer()
+    if args.profile: tracer.enable()
 
     if not os.path.exists('outputs'):
         os.makedirs('outputs')
-    output_filename = args.output_file or f'output_{datetime.now().strftime("%Y-%m-%d_%H-%M-%S")}.json'
-    output_filename = os.path.join('outputs', output_filename)
+    skip_urls: set[str] = set()
+    if args.resume:
+        output_filename = args.resume if os.path.exists(args.resume) else os.path.join('outputs', args.resume)
+        if not os.path.exists(output_filename):
+            parser.error(f'Cannot resume, file not found: {args.resume}')
+        skip_urls = {record['url'] for record in JsonlWriter.read(output_filename)}
+        logger.info(f'Resuming {output_filename}, skipping {len(skip_urls)} articles already in it')
+    else:
+        output_filename = args.output_file or f'output_{logger.run_id}.jsonl'
+        output_filename = os.path.join('outputs', output_filename)
 
-    with Browser() as context:
-        g = GoogleNewsReader(browser_context=context, debug=args.debug)
-        news = g.get_news(scrolls=args.scrolls)
-        with open(output_filename, 'w') as f:
-            json.dump(news, f)
+    # Imported only now, so `--help` and argument errors don't pay for Playwright and the model libraries
+    from .article_fetcher import AsyncArticleFetcher
+    from .google_news_reader import GoogleNewsReader
+    from .url_index import UrlIndex
+    from .model_gateway import ModelGateway
+    from .news_page_scraper import NewsPageScraper
+    from .replay import FixtureRecorder
+    from .scheduler import TopicScheduler
+    from .ocr_worker import OcrWorkerPool
+    from .image_preprocessing import ImagePreprocessor
+    from .cache import Cache
+    from .florence import Florence
+    from .types_ import OcrOptions
 
-    logger.info(f'Done, exported articles to: {output_filename}')
+    topics: dict[str, str] = {}
+    for topic in args.topics:
+        name, _, url = topic.partition('=')
+        if url: topics[name] = url
+        elif name in GoogleNewsReader.TOPICS: topics[name] = GoogleNewsReader.TOPICS[name]
+        else: parser.error(f'Unknown topic: {name} (known topics are {", ".join(GoogleNewsReader.TOPICS)}, others are given as NAME=URL)')
+
+    gateway = ModelGateway(
+        concurrency={GoogleNewsReader.VLM_MODEL: args.vlm_concurrency, NewsPageScraper.MODEL: args.llm_concurrency,
+                     Florence.MODEL_NAME: args.ocr_workers * args.ocr_batch if args.ocr_workers > 0 else 1},  # the OCR pool's capacity
+        max_inference=args.max_inference,
+        keep_alive=args.keep_alive
+    )
+    gateway.warm_up([GoogleNewsReader.VLM_MODEL, NewsPageScraper.MODEL])
+
+    ocr_options: OcrOptions = {'engine': args.ocr_engine, 'num_beams': args.ocr_beams, 'max_new_tokens': args.ocr_max_tokens, 'threads': args.ocr_threads or None}
+    Florence(**ocr_options)  # configured before the reader uses it; the model itself is loaded on first OCR
+    # Configured before anything else stores artifacts in it
+    Cache(max_bytes=int(args.cache_max_mb * 1024 * 1024) if args.cache_max_mb > 0 else None,
+          max_age_seconds=args.cache_max_age_days * 24 * 60 * 60 if args.cache_max_age_days > 0 else None)
+    with ExitStack() as stack:
+        fetcher = None
+        if args.engine == 'async':
+            fetcher = stack.enter_context(AsyncArticleFetcher(max_tabs=args.max_tabs, page_timeout=args.page_timeout, headless=args.headless,
+                                                              block_requests=args.block_requests, wait_until=args.wait_until,
+                                                              recycle_after=args.recycle_after or None))
+        url_index = UrlIndex(ttl_seconds=args.url_ttl_hours * 60 * 60) if args.url_index else None
+        if url_index: stack.callback(url_index.close)
+        ocr_pool = stack.enter_context(OcrWorkerPool(workers=args.ocr_workers, max_batch=args.ocr_batch, options=ocr_options)) if args.ocr_workers > 0 else None
+        recorder = FixtureRecorder(args.record) if args.record else None
+        if recorder: stack.callback(recorder.save)
+        preprocessor = None
+        if args.crop or args.max_image_side or args.tile_height:
+            preprocessor = ImagePreprocessor(crop=args.crop, max_side=args.max_image_side or None, tile_height=args.tile_height or None)
+        partial_writer = None
+        if args.stream_cleaning:
+            partial_filename = f'{os.path.splitext(output_filename)[0]}.partial.jsonl'
+            partial_writer = PartialTextWriter(stack.enter_context(JsonlWriter(partial_filename, append=bool(args.resume))))
+            logger.info(f'Writing the text of articles as it is cleaned to: {partial_filename}')
+        g = GoogleNewsReader(topics=topics, debug=args.debug, memo=args.memo, extract_content=args.extract_content, 
+                             stream_cleaning=args.stream_cleaning, on_partial_text=partial_writer, url_index=url_index, 
+                             fetcher=fetcher, recorder=recorder, ocr_pool=ocr_pool,
+                             save_screenshots=args.save_screenshots, preprocessor=preprocessor, wait_until=args.wait_until,
+                             max_tabs=args.max_tabs, concurrent_analysis=args.concurrent_analysis)
+        scheduler = TopicScheduler(g, parallelism=args.parallel_topics, headless=args.headless, block_requests=args.block_requests)
+        writer = stack.enter_context(JsonlWriter(output_filename, append=bool(args.resume)))
+        for topic, article in scheduler.iter_news(scrolls=args.scrolls, skip_urls=skip_urls):
+            writer.write({'topic': topic, **article})
+            if partial_writer: partial_writer.finish(article['url'])
+
+    logger.info(f'Done, exported {writer.count} articles to: {output_filename}')
+    if args.profile:
+        trace_filename = f'{os.path.splitext(output_filename)[0]}.trace.json'
+        tracer.export_chrome_trace(trace_filename)
+        logger.info(f'Run profile (Chrome trace exported to: {trace_filename}):\n{tracer.summary_table()}')
+
+
+if __name__ == '__main__':
+    run()
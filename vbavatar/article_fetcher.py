@@ -0,0 +1,112 @@
+import re
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Literal
+from playwright.async_api import BrowserContext, TimeoutError as PlaywrightTimeoutError
+from .browser import AsyncBrowser
+from .logger import Logger
+
+
+class AsyncArticleFetcher:
+    # Loads article pages concurrently in tabs of an async Playwright browser.
+    # The browser lives in its own thread and event loop, so the sync engine can hand it URLs without blocking.
+    NOT_GOOGLE_NEWS_URL_RE_PATTERN = re.compile(r"^(?!https?:\/\/(?:www\.)?news\.google\.com).*$")
+
+    def __init__(self,
+                 *,
+                 max_tabs: int = 4,
+                 page_timeout: float = 30,
+                 height: int = 900,
+                 width: int = 1050,
+                 headless: bool = False,
+                 block_requests: bool = False,
+                 wait_until: Literal['load', 'domcontentloaded'] = 'load',
+                 recycle_after: int | None = 50
+                 ) -> None:
+        self.logger = Logger()
+        self.max_tabs = max_tabs
+        self.page_timeout = page_timeout
+        self.wait_until: Literal['load', 'domcontentloaded'] = wait_until  # when the HTML is taken from the page
+        self._browser = AsyncBrowser(height=height, width=width, headless=headless, block_requests=block_requests)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='async-article-fetcher', daemon=True)
+        self._context: BrowserContext | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        # The context is replaced by a fresh one after recycle_after articles, so what pages leave behind (caches,
+        # service workers, leaked renderers) doesn't build up; the old one is closed once its last page is.
+        self.recycle_after = recycle_after
+        self.recycled = 0
+        self._loaded = 0  # articles loaded in the current context
+        self._open_pages: dict[BrowserContext, int] = {}
+
+    async def _start(self) -> None:
+        self._context = await self._browser.__aenter__()
+        self._semaphore = asyncio.Semaphore(self.max_tabs)
+
+    async def _stop(self, *args) -> None:
+        await self._browser.__aexit__(*args)
+
+    def __enter__(self) -> 'AsyncArticleFetcher':
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def __exit__(self, *args) -> None:
+        asyncio.run_coroutine_threadsafe(self._stop(*args), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _load(self, url: str) -> tuple[str, str]:
+        assert self._context is not None, f'{self.__class__.__name__} must be entered before fetching'
+        timeout_ms = self.page_timeout * 1000
+        context = self._context
+        self._open_pages[context] = self._open_pages.get(context, 0) + 1
+        try:
+            page = await context.new_page()
+        except Exception:
+            await self._release(context)
+            raise
+        try:
+            await page.goto(url, timeout=timeout_ms, wait_until=self.wait_until)
+            # Google News links go through a redirect page first
+            await page.wait_for_url(self.NOT_GOOGLE_NEWS_URL_RE_PATTERN, timeout=timeout_ms, wait_until=self.wait_until)
+            await page.wait_for_load_state(self.wait_until, timeout=timeout_ms)
+            return page.url, await page.content()
+        finally:
+            await page.close()
+            await self._release(context)
+
+    async def _release(self, context: BrowserContext) -> None:
+        self._open_pages[context] -= 1
+        if context is self._context:
+            self._loaded += 1
+            if self.recycle_after and self._loaded >= self.recycle_after:
+                self._loaded = 0
+                self._context = await self._browser.new_context()
+                self.recycled += 1
+                self.logger.debug(f'Recycled the article browser context after {self.recycle_after} articles')
+        if context is not self._context and self._open_pages[context] == 0:
+            del self._open_pages[context]
+            await context.close()
+
+    async def _fetch(self, url: str) -> tuple[str, str] | None:
+        assert self._semaphore is not None, f'{self.__class__.__name__} must be entered before fetching'
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(self._load(url), timeout=self.page_timeout)
+            except (PlaywrightTimeoutError, asyncio.TimeoutError) as e:
+                self.logger.error(f'Timed out loading {url} | {e.__class__.__name__}: {e}')
+            except Exception as e:
+                self.logger.error(f'Failed loading {url} | {e.__class__.__name__}: {e}')
+            return None
+
+    def fetch(self, url: str) -> Future[tuple[str, str] | None]:
+        # Returns immediately; the future resolves to (final url, html), or None if the page failed to load
+        return asyncio.run_coroutine_threadsafe(self._fetch(url), self._loop)
+
+    def fetch_all(self, urls: list[str]) -> list[tuple[str, str]]:
+        futures = [self.fetch(url) for url in urls]
+        results = [f.result() for f in futures]
+        return [r for r in results if r is not None]
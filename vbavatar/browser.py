@@ -1,12 +1,69 @@
-from playwright.sync_api import sync_playwright, BrowserContext, Playwright
+from urllib.parse import urlsplit
+from playwright.sync_api import sync_playwright, BrowserContext, Page, Playwright, Request, Route
+from playwright.async_api import async_playwright, BrowserContext as AsyncBrowserContext, Playwright as AsyncPlaywright, Route as AsyncRoute
+from .logger import Logger
+from .utils import domain_of_url
+
+
+class RequestFilter:
+    # Article pages are only read for their HTML, so their images, media and fonts, and requests to known ad and
+    # tracker domains, are aborted. Pages on Google News itself are left alone, as they are screenshotted.
+    BLOCKED_RESOURCE_TYPES = {'image', 'media', 'font'}
+    TRACKER_DOMAINS = (
+        'doubleclick.net', 'googlesyndication.com', 'googleadservices.com', 'google-analytics.com',
+        'googletagmanager.com', 'googletagservices.com', 'adservice.google.com', 'connect.facebook.net',
+        'scorecardresearch.com', 'quantserve.com', 'taboola.com', 'outbrain.com', 'criteo.com', 'criteo.net',
+        'amazon-adsystem.com', 'adnxs.com', 'pubmatic.com', 'rubiconproject.com', 'casalemedia.com',
+        'openx.net', 'moatads.com', 'hotjar.com', 'chartbeat.com', 'chartbeat.net', 'parsely.com',
+        'krxd.net', 'bluekai.com', 'demdex.net', 'omtrdc.net', 'nr-data.net', 'optimizely.com', 'segment.io',
+        'cdn.segment.com', 'permutive.com', 'adsafeprotected.com', 'media.net', 'sharethrough.com',
+    )
+
+    def __init__(self) -> None:
+        self.blocked = 0
+
+    def should_block(self, request: Request) -> bool:
+        try:
+            page_url = request.frame.page.url
+        except Exception:  # requests of service workers have no frame
+            page_url = ''
+        if 'news.google.com' in domain_of_url(page_url):
+            return False
+        if request.is_navigation_request() and request.frame.parent_frame is None:
+            return False  # the article itself
+        if request.resource_type in self.BLOCKED_RESOURCE_TYPES:
+            return True
+        host = (urlsplit(request.url).hostname or '').lower()
+        return any(host == domain or host.endswith('.' + domain) for domain in self.TRACKER_DOMAINS)
+
+    def handle(self, route: Route) -> None:
+        if self.should_block(route.request):
+            self.blocked += 1
+            route.abort()
+        else:
+            route.continue_()
+
+    async def handle_async(self, route: AsyncRoute) -> None:
+        if self.should_block(route.request):  # pyright: ignore[reportArgumentType]
+            self.blocked += 1
+            await route.abort()
+        else:
+            await route.continue_()
 
 
 class Browser:
-    def __init__(self, *, height: int = 900, width: int = 1050) -> None:
+    def __init__(self, *, height: int = 900, width: int = 1050, headless: bool = False, block_requests: bool = False) -> None:
+        self.logger = Logger()
         self._client = sync_playwright()
         self._browser = None
         self._context = None
         self._viewport = {'height': height, 'width': width}
+        self._headless = headless
+        self._request_filter = RequestFilter() if block_requests else None
+
+    @property
+    def blocked_requests(self) -> int:
+        return self._request_filter.blocked if self._request_filter else 0
 
     def _get_device(self, playwright: Playwright) -> dict:
         device = playwright.devices['Desktop Chrome']
@@ -16,11 +73,56 @@ class Browser:
     def __enter__(self) -> BrowserContext:
         playwright = self._client.__enter__()
         browser_client = playwright.chromium
-        self._browser = browser_client.launch(headless=False) 
+        self._browser = browser_client.launch(headless=self._headless)
         context = self._browser.new_context(**self._get_device(playwright))
+        if self._request_filter: context.on('page', self._route_article_page)
         self._context = context
         return context
-    
+
+    def _route_article_page(self, page: Page) -> None:
+        # Only article tabs, which are opened by clicking on the Google News page, are routed. With the sync API,
+        # route handlers only run while a Playwright call is in progress, so routing the Google News page would hold
+        # its feed requests whenever the reader isn't calling Playwright.
+        if self._request_filter and page.opener() is not None:
+            page.route('**/*', self._request_filter.handle)
+
     def __exit__(self, *args) -> None:
+        if self._request_filter: self.logger.debug(f'Blocked {self._request_filter.blocked} requests of article pages')
         if self._browser: self._browser.close()
         if self._client: self._client.__exit__(*args)
+
+
+class AsyncBrowser:
+    def __init__(self, *, height: int = 900, width: int = 1050, headless: bool = False, block_requests: bool = False) -> None:
+        self.logger = Logger()
+        self._client = async_playwright()
+        self._playwright: AsyncPlaywright | None = None
+        self._browser = None
+        self._viewport = {'height': height, 'width': width}
+        self._headless = headless
+        self._request_filter = RequestFilter() if block_requests else None
+
+    @property
+    def blocked_requests(self) -> int:
+        return self._request_filter.blocked if self._request_filter else 0
+
+    def _get_device(self, playwright: AsyncPlaywright) -> dict:
+        device = playwright.devices['Desktop Chrome']
+        device['viewport'] = self._viewport
+        return device
+
+    async def new_context(self) -> AsyncBrowserContext:
+        assert self._browser is not None and self._playwright is not None, f'{self.__class__.__name__} must be entered first'
+        context = await self._browser.new_context(**self._get_device(self._playwright))
+        if self._request_filter: await context.route('**/*', self._request_filter.handle_async)
+        return context
+
+    async def __aenter__(self) -> AsyncBrowserContext:
+        self._playwright = await self._client.__aenter__()
+        self._browser = await self._playwright.chromium.launch(headless=self._headless)
+        return await self.new_context()
+
+    async def __aexit__(self, *args) -> None:
+        if self._request_filter: self.logger.debug(f'Blocked {self._request_filter.blocked} requests of article pages')
+        if self._browser: await self._browser.close()
+        if self._client: await self._client.__aexit__(*args)
@@ -1,33 +1,171 @@
 import os
+import re
+import time
+import atexit
 import shutil
+import sqlite3
+import threading
 from datetime import datetime
+from .logger import Logger
 from .singleton_metaclass import SingletonMeta
+from .types_ import CachedArtifact
 
 
 class Cache(metaclass=SingletonMeta):
+    # Every run writes its artifacts (screenshots, debug overlays, OCR records) to a directory of its own, and
+    # indexes them by kind and run. Disk use is bounded by compacting all run directories together: artifacts older
+    # than max_age_seconds are removed, then the least recently used ones until the total is within max_bytes.
+    # The memo store and the URL index live in the root too, but have retention of their own and are never evicted.
     _ROOT_DIR = 'cache'
+    _INDEX_FILE_NAME = 'artifacts.sqlite'
+    _RUN_DIR_FORMAT = '%Y%m%d%H%M%S'
+    _RUN_DIR_RE = re.compile(r'^\d{14}$')
+    _COMPACTION_CHECK_BYTES = 64 * 1024 * 1024  # compact in the background after writing this many bytes
+    _EMPTY_RUN_GRACE_SECONDS = 24 * 60 * 60
 
-    def __init__(self) -> None:
+    def __init__(self,
+                 *,
+                 max_bytes: int | None = 1024 * 1024 * 1024,
+                 max_age_seconds: float | None = 14 * 24 * 60 * 60
+                 ) -> None:
         if getattr(self, "_initialized", False):
             return
         else:
             super().__init__()
             self._initialized = True
+            self.logger = Logger()
+            self.max_bytes = max_bytes
+            self.max_age_seconds = max_age_seconds
             self._init_time = datetime.now()
             for dr in [self.root, self.directory]:
                 if not os.path.exists(dr):
                     os.makedirs(dr)
+            self._lock = threading.Lock()
+            self._compaction_lock = threading.Lock()
+            self._written_since_compaction = 0
+            self._connection = self._connect()  # guarded by self._lock
+            self._compact_in_background()
+            atexit.register(self.compact)
 
     @property
     def root(self) -> str:
         return os.path.join(os.getcwd(), self._ROOT_DIR)
     
+    @property
+    def run(self) -> str:
+        return self._init_time.strftime(self._RUN_DIR_FORMAT)
+
     @property
     def directory(self) -> str:
-        return os.path.join(self.root, self._init_time.strftime('%Y%m%d%H%M%S'))
-    
+        return os.path.join(self.root, self.run)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(os.path.join(self.root, self._INDEX_FILE_NAME), check_same_thread=False)
+        with connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS artifacts (run TEXT NOT NULL, name TEXT NOT NULL, kind TEXT NOT NULL, '
+                               'bytes INTEGER NOT NULL, created REAL NOT NULL, PRIMARY KEY (run, name))')
+            connection.execute('CREATE INDEX IF NOT EXISTS artifacts_kind ON artifacts (kind, run)')
+        return connection
+
+    def write(self, name: str, data: bytes, *, kind: str) -> str:
+        # Writes an artifact of this run, and returns its path
+        path = os.path.join(self.directory, name)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            with self._connection:
+                self._connection.execute('INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?)',
+                                         (self.run, name, kind, len(data), time.time()))
+            self._written_since_compaction += len(data)
+            should_compact = self._written_since_compaction >= self._COMPACTION_CHECK_BYTES
+            if should_compact: self._written_since_compaction = 0
+        if should_compact:
+            self._compact_in_background()
+        return path
+
+    def artifacts(self, *, kind: str | None = None, run: str | None = None) -> list[CachedArtifact]:
+        query, params = 'SELECT run, name, kind, bytes, created FROM artifacts WHERE 1 = 1', []
+        if kind is not None:
+            query += ' AND kind = ?'
+            params.append(kind)
+        if run is not None:
+            query += ' AND run = ?'
+            params.append(run)
+        with self._lock:
+            rows = self._connection.execute(query + ' ORDER BY run, created', params).fetchall()
+        return [{'run': r, 'name': n, 'kind': k, 'path': os.path.join(self.root, r, n), 'bytes': b, 'created': c}
+                for r, n, k, b, c in rows]
+
+    def _run_directories(self) -> list[str]:
+        return [entry.name for entry in os.scandir(self.root) if entry.is_dir() and self._RUN_DIR_RE.match(entry.name)]
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _compact_in_background(self) -> None:
+        threading.Thread(target=self.compact, name='cache-compaction', daemon=True).start()
+
+    def compact(self) -> None:
+        with self._compaction_lock:
+            started = time.time()
+            entries: list[tuple[float, int, str, str]] = []  # (last access, size, run, name)
+            for run in self._run_directories():
+                run_directory = os.path.join(self.root, run)
+                for dirpath, _, filenames in os.walk(run_directory):
+                    for filename in filenames:
+                        if filename.endswith('.tmp'): continue  # still being written
+                        path = os.path.join(dirpath, filename)
+                        try:
+                            stat = os.stat(path)
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, run, os.path.relpath(path, run_directory)))
+
+            removed: list[tuple[float, int, str, str]] = []
+            if self.max_age_seconds is not None:
+                oldest_allowed = time.time() - self.max_age_seconds
+                removed += [e for e in entries if e[0] < oldest_allowed]
+                entries = [e for e in entries if e[0] >= oldest_allowed]
+            total_bytes = sum(size for _, size, _, _ in entries)
+            entries.sort()
+            while entries and self.max_bytes is not None and total_bytes > self.max_bytes:
+                entry = entries.pop(0)
+                removed.append(entry)
+                total_bytes -= entry[1]
+            for _, _, run, name in removed:
+                self._remove(os.path.join(self.root, run, name))
+
+            for run in self._run_directories():
+                # Empty directories of recent runs are kept, as another run may still be writing to them
+                run_directory = os.path.join(self.root, run)
+                run_started = datetime.strptime(run, self._RUN_DIR_FORMAT).timestamp()
+                if run != self.run and not os.listdir(run_directory) and run_started < started - self._EMPTY_RUN_GRACE_SECONDS:
+                    os.rmdir(run_directory)
+
+            # Files removed here, or by hand, are dropped from the index too
+            kept = {(run, name) for _, _, run, name in entries}
+            with self._lock:
+                indexed = self._connection.execute('SELECT run, name FROM artifacts WHERE created < ?', (started,)).fetchall()
+                with self._connection:
+                    self._connection.executemany('DELETE FROM artifacts WHERE run = ? AND name = ?',
+                                                 [row for row in indexed if row not in kept])
+            if removed:
+                self.logger.debug(f'Cache: evicted {len(removed)} files, {total_bytes} bytes remaining')
+
     def clear(self, *, all: bool = False) -> None:
-        dr = self.root if all else self.directory
-        shutil.rmtree(dr)
-        os.mkdir(dr)
-    
\ No newline at end of file
+        with self._compaction_lock, self._lock:
+            if all:
+                self._connection.close()
+                shutil.rmtree(self.root)
+                os.makedirs(self.directory)
+                self._connection = self._connect()
+            else:
+                shutil.rmtree(self.directory)
+                os.mkdir(self.directory)
+                with self._connection:
+                    self._connection.execute('DELETE FROM artifacts WHERE run = ?', (self.run,))
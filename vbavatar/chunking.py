@@ -0,0 +1,42 @@
+import re
+from .utils import estimate_tokens
+
+
+def _split_oversized(paragraph: str, token_budget: int) -> list[str]:
+    # Paragraphs which exceed the budget on their own are split by lines, then by sentences, then by words
+    for separator_re in (r'\n', r'(?<=[.!?])\s+', r'\s+'):
+        parts = [p for p in re.split(separator_re, paragraph) if p.strip()]
+        if len(parts) > 1:
+            return _pack(parts, token_budget, joiner='\n' if separator_re == r'\n' else ' ')
+    max_chars = token_budget * 4
+    return [paragraph[i:i + max_chars] for i in range(0, len(paragraph), max_chars)]
+
+
+def _pack(parts: list[str], token_budget: int, *, joiner: str) -> list[str]:
+    chunks: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+    for part in parts:
+        part_tokens = estimate_tokens(part)
+        if part_tokens > token_budget:
+            if current:
+                chunks.append(joiner.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_oversized(part, token_budget))
+            continue
+        if current and current_tokens + part_tokens > token_budget:
+            chunks.append(joiner.join(current))
+            current, current_tokens = [], 0
+        current.append(part)
+        current_tokens += part_tokens
+    if current:
+        chunks.append(joiner.join(current))
+    return chunks
+
+
+def split_paragraphs(text: str, *, token_budget: int) -> list[str]:
+    # Splits text into chunks of up to `token_budget` (estimated) tokens, on paragraph boundaries where possible
+    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', text) if p.strip()]
+    if not paragraphs:
+        return [text]
+    return _pack(paragraphs, token_budget, joiner='\n\n')
@@ -0,0 +1,106 @@
+import re
+import importlib.util
+from typing import TYPE_CHECKING
+from .types_ import ExtractedContent
+from .utils import estimate_tokens, lazy_import
+
+if TYPE_CHECKING:
+    from bs4 import Tag
+
+bs4 = lazy_import('bs4')
+
+
+class ContentExtractor:
+    # Readability-style extraction of the main content of a page: paragraphs are scored by their length,
+    # scores propagate to their ancestors, and the best ancestor is kept, penalized by its link density.
+    REMOVED_TAGS = ['script', 'style', 'noscript', 'template', 'nav', 'header', 'footer', 'aside', 'form',
+                    'button', 'iframe', 'svg', 'canvas', 'video', 'audio', 'select', 'dialog']
+    PARAGRAPH_TAGS = ['p', 'pre', 'blockquote', 'li', 'h2', 'h3', 'td']
+    BLOCK_TAGS = {'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'blockquote', 'pre'}  # separated by blank lines in the text
+    UNLIKELY_RE = re.compile(r'cookie|consent|banner|comment|share|social|subscribe|newsletter|related|recommend|'
+                             r'promo|sponsor|advert|\bads?\b|popup|modal|sidebar|breadcrumb|footer|menu|masthead', re.I)
+    LIKELY_RE = re.compile(r'article|body|content|entry|main|post|story|text', re.I)
+
+    def __init__(self, *, min_text_length: int = 250, min_paragraph_length: int = 25) -> None:
+        self.min_text_length = min_text_length
+        self.min_paragraph_length = min_paragraph_length
+        # lxml is several times faster than the builtin parser, but it's an optional dependency
+        self.parser = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+    def _class_and_id(self, tag: 'Tag') -> str:
+        classes = tag.get('class') or []
+        if isinstance(classes, str): classes = [classes]
+        return ' '.join([*classes, str(tag.get('id') or '')])
+
+    def _remove_boilerplate(self, root: 'Tag') -> None:
+        for tag in root.find_all(self.REMOVED_TAGS):
+            tag.decompose()
+        for tag in root.find_all(True):
+            if tag.decomposed or tag.name in ('html', 'body', 'article', 'main'): continue
+            class_and_id = self._class_and_id(tag)
+            if class_and_id.strip() and self.UNLIKELY_RE.search(class_and_id) and not self.LIKELY_RE.search(class_and_id):
+                tag.decompose()
+
+    def _link_density(self, tag: 'Tag', text_length: int) -> float:
+        link_length = sum(len(a.get_text(strip=True)) for a in tag.find_all('a'))
+        return link_length / max(text_length, 1)
+
+    def _best_candidate(self, root: 'Tag') -> 'Tag | None':
+        scores: dict[int, float] = {}
+        tags: dict[int, 'Tag'] = {}
+        for paragraph in root.find_all(self.PARAGRAPH_TAGS):
+            text = paragraph.get_text(' ', strip=True)
+            if len(text) < self.min_paragraph_length: continue
+            score = 1 + text.count(',') + min(len(text) / 100, 3)
+            # The parent gets the full score, the grandparent half of it
+            for ancestor, weight in zip(paragraph.parents, (1.0, 0.5)):
+                if ancestor is None or ancestor.name in ('html', '[document]'): break
+                key = id(ancestor)
+                tags[key] = ancestor
+                scores[key] = scores.get(key, 0.0) + score * weight
+
+        best: 'Tag | None' = None
+        best_score = 0.0
+        for key, score in scores.items():
+            tag = tags[key]
+            if self.LIKELY_RE.search(self._class_and_id(tag)) or tag.name in ('article', 'main'):
+                score *= 1.25
+            score *= 1 - self._link_density(tag, len(tag.get_text(strip=True)))
+            if score > best_score:
+                best, best_score = tag, score
+        return best
+
+    def _text_of(self, tag: 'Tag') -> str:
+        # The strings of each block element (or of the text between them) are joined as the browser would render
+        # them, with their whitespace collapsed; blocks are separated by blank lines, marking the paragraphs
+        blocks: list[tuple['Tag', list[str]]] = []
+        for string in tag.find_all(string=True):
+            if type(string) is not bs4.NavigableString: continue  # comments, CDATA, doctypes
+            block = next((parent for parent in string.parents if parent is tag or parent.name in self.BLOCK_TAGS), tag)
+            if not blocks or blocks[-1][0] is not block:
+                blocks.append((block, []))
+            blocks[-1][1].append(str(string))
+        paragraphs: list[str] = []
+        for block, strings in blocks:
+            text = ''.join(strings)
+            text = text.strip('\n') if block.name == 'pre' else re.sub(r'\s+', ' ', text).strip()
+            if text: paragraphs.append(text)
+        return '\n\n'.join(paragraphs)
+
+    def extract(self, html: str) -> ExtractedContent:
+        soup = bs4.BeautifulSoup(html, self.parser)
+        title = soup.title.string if soup.title and soup.title.string else ''
+        raw_text = soup.get_text()  # what the LLM would have received without extraction
+        root = soup.body or soup
+        self._remove_boilerplate(root)
+        candidate = self._best_candidate(root)
+        text = self._text_of(candidate) if candidate is not None else ''
+        if len(text) < self.min_text_length:
+            # Too little was recognized as the article, so the whole page is kept, minus the boilerplate
+            text = self._text_of(root)
+        return ExtractedContent(
+            title=title.strip(),
+            text=text,
+            raw_tokens=estimate_tokens(raw_text),
+            tokens=estimate_tokens(text)
+        )
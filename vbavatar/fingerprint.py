@@ -0,0 +1,54 @@
+import threading
+from typing import Any, TYPE_CHECKING
+from .utils import lazy_import
+
+if TYPE_CHECKING:
+    from PIL.Image import Image as PillowImage
+
+Image = lazy_import('PIL.Image')
+
+
+def dhash(image: 'PillowImage', *, hash_size: int = 16) -> int:
+    # Difference hash: compares the brightness of horizontally adjacent cells of a downscaled grayscale image.
+    # Insensitive to compression noise and small rendering differences, but changes once the page content moves.
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = list(small.getdata())
+    fingerprint = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            fingerprint = (fingerprint << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class FingerprintMemo:
+    # Maps fingerprints to values, where a lookup also matches near-identical fingerprints
+    def __init__(self, *, max_distance: int = 4) -> None:
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self._entries: dict[int, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint: int) -> Any | None:
+        with self._lock:
+            if fingerprint in self._entries:
+                self.hits += 1
+                return self._entries[fingerprint]
+            for known, value in self._entries.items():
+                if hamming_distance(known, fingerprint) <= self.max_distance:
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, fingerprint: int, value: Any) -> None:
+        with self._lock:
+            self._entries[fingerprint] = value
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,125 @@
+import time
+import threading
+from typing import Literal, TYPE_CHECKING
+from .logger import Logger
+from .model_gateway import ModelGateway
+from .singleton_metaclass import SingletonMeta
+from .tracing import Tracer
+from .utils import torch_device
+
+if TYPE_CHECKING:
+    from PIL.Image import Image as PillowImage
+
+
+class _Cancelled:
+    # Stopping criterion of generate(): stops every sequence once the event is set
+    def __init__(self, cancel: threading.Event) -> None:
+        self.cancel = cancel
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+        return torch.full((input_ids.shape[0],), self.cancel.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+class Florence(metaclass=SingletonMeta):
+    # engine='int8' quantizes the linear layers of the model to int8 weights on load (CPU only), num_beams=1 decodes
+    # greedily, and max_new_tokens caps the output: the tokens of every line of text on the screen, plus 8 for its box
+    MODEL_NAME = 'microsoft/Florence-2-base'
+    OCR_WITH_REGION = '<OCR_WITH_REGION>'
+
+    def __init__(self,
+                 *,
+                 engine: Literal['eager', 'int8'] = 'eager',
+                 num_beams: int = 3,
+                 max_new_tokens: int = 1024,
+                 threads: int | None = None
+                 ) -> None:
+        if getattr(self, "_initialized", False):
+            return
+        else:
+            super().__init__()
+            self._initialized = True
+            self.logger = Logger()
+            self.tracer = Tracer()
+            self.gateway = ModelGateway()
+            self.engine = engine
+            self.num_beams = num_beams
+            self.max_new_tokens = max_new_tokens
+            self.threads = threads
+            self._lock = threading.Lock()
+            self._model = None
+            self._processor = None
+            self.device: str | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self) -> None:
+        # Importing torch/transformers and loading the weights takes seconds, so it's done only once OCR is needed
+        with self._lock:
+            if self.loaded: return
+            import torch
+            from transformers import AutoModelForCausalLM, AutoProcessor
+            if self.threads: torch.set_num_threads(self.threads)
+            self.device = torch_device()
+            self.logger.info(f'Loading {self.MODEL_NAME} on {self.device} ({self.engine})')
+            self._processor = AutoProcessor.from_pretrained(self.MODEL_NAME, trust_remote_code=True)
+            self._model = AutoModelForCausalLM.from_pretrained(self.MODEL_NAME, trust_remote_code=True).eval().to(self.device)
+            self._apply_engine()
+
+    def _apply_engine(self) -> None:
+        import torch
+        if self.engine != 'int8': return
+        if self.device != 'cpu':
+            self.logger.warning(f'int8 OCR engine runs only on CPU, using the eager engine on {self.device}')
+            self.engine = 'eager'
+            return
+        # Weights of the linear layers (most of the model) are stored as int8, activations are quantized on the fly
+        self._model = torch.ao.quantization.quantize_dynamic(self._model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def ocr_with_region(self, image: 'PillowImage', *, cancel: threading.Event | None = None) -> dict:
+        return self.ocr_with_region_batch([image], cancel=cancel)[0]
+
+    def ocr_with_region_batch(self, images: list['PillowImage'], *, cancel: threading.Event | None = None) -> list[dict]:
+        # Once cancel is set, generation stops at the next token; the (partial) output is for the caller to discard
+        self.load()
+        # Shares the concurrency limits of the gateway with the Ollama models, so concurrent topics don't oversubscribe the device
+        return self.gateway.run(self.MODEL_NAME, lambda: self._ocr_with_region(images, cancel))
+
+    def _ocr_with_region(self, images: list['PillowImage'], cancel: threading.Event | None = None) -> list[dict]:
+        import torch
+        from transformers import StoppingCriteriaList
+        if cancel is not None and cancel.is_set():
+            return [{'labels': [], 'quad_boxes': []} for _ in images]
+        model, processor, device = self._model, self._processor, self.device
+        assert model is not None and processor is not None
+        prompt = self.OCR_WITH_REGION
+        with self.tracer.span('florence', images=len(images), engine=self.engine, num_beams=self.num_beams) as span:
+            start = time.perf_counter()
+            inputs = processor(text=[prompt] * len(images), images=images, return_tensors="pt").to(device)
+            preprocessed = time.perf_counter()
+            with torch.inference_mode():
+                generated_ids = model.generate(
+                    input_ids=inputs["input_ids"].to(device),
+                    pixel_values=inputs["pixel_values"].to(device),
+                    max_new_tokens=self.max_new_tokens,
+                    early_stopping=False,
+                    do_sample=False,
+                    num_beams=self.num_beams,
+                    stopping_criteria=StoppingCriteriaList([_Cancelled(cancel)]) if cancel is not None else None,
+                )
+            generated = time.perf_counter()
+            generated_texts = processor.batch_decode(generated_ids, skip_special_tokens=False)
+            parsed_answers: list[dict] = [
+                processor.post_process_generation(generated_text, task=prompt, image_size=(image.width, image.height))
+                for generated_text, image in zip(generated_texts, images)
+            ]
+            span.set(
+                preprocess_seconds=preprocessed - start,
+                generate_seconds=generated - preprocessed,
+                postprocess_seconds=time.perf_counter() - generated,
+                new_tokens=(generated_ids.shape[-1] - 1) * len(images),  # minus the decoder start token
+                cancelled=cancel is not None and cancel.is_set(),
+            )
+        return [parsed_answer[prompt] for parsed_answer in parsed_answers]
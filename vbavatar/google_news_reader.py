@@ -1,24 +1,40 @@
-import os
+import io
 import re
 import json
+import queue
 import random
-import ollama
-import numpy as np
-from tqdm import tqdm
-from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
-from PIL import Image, ImageDraw
-from PIL.Image import Image as PillowImage
-from time import sleep
-from pydantic import BaseModel, field_validator
+import threading
+import contextvars
 from concurrent.futures import ThreadPoolExecutor
-from transformers import AutoModelForCausalLM, AutoProcessor
-from typing import cast
+from contextlib import nullcontext
+from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
+from pydantic import BaseModel, field_validator
+from collections import Counter, deque
+from typing import cast, Callable, Iterable, Iterator, Literal, TYPE_CHECKING
 from .browser import BrowserContext
 from .logger import Logger
-from .utils import dedent, torch_device, domain_of_url
+from .utils import dedent, domain_of_url, lazy_import
+from .florence import Florence
+from .model_gateway import ModelGateway
+from .tracing import Tracer
+from .fingerprint import FingerprintMemo, dhash, hamming_distance
 from .news_page_scraper import NewsPageScraper
 from .cache import Cache
-from .types_ import Article
+from .pipeline import Pipeline, Stage
+from .title_matcher import TitleMatcher
+from .url_index import UrlIndex, canonicalize_url
+from .screenshot import Screenshot
+from .page_manager import PageManager
+from .image_preprocessing import ImagePreprocessor
+from .types_ import Article, ScreenshotFrame
+
+if TYPE_CHECKING:
+    from .article_fetcher import AsyncArticleFetcher
+    from .replay import FixtureRecorder
+    from .ocr_worker import OcrWorkerPool
+
+np = lazy_import('numpy')
+ImageDraw = lazy_import('PIL.ImageDraw')
 
 
 class Titles(BaseModel):
@@ -33,31 +49,65 @@ class Titles(BaseModel):
 
 
 class GoogleNewsReader:
-    SECTION_IMAGE_NAME_TEMPLATE = 'gn_S{i}.png'
+    SECTION_IMAGE_NAME_TEMPLATE = 'gn_{topic}_S{i}.png'
+    VLM_MODEL = 'llama3.2-vision'
+    END_OF_FEED_DISTANCE = 2  # max bits differing between fingerprints of consecutive screenshots to assume scrolling stopped
+    TOPICS = {
+        # Google News -> Technology -> AI
+        'AI': 'https://news.google.com/topics/CAAqKggKIiRDQkFTRlFvSUwyMHZNRGRqTVhZU0JXVnVMVWRDR2dKSlRDZ0FQAQ/sections/CAQiQ0NCQVNMQW9JTDIwdk1EZGpNWFlTQW1WdUdnSlZVeUlOQ0FRYUNRb0hMMjB2TUcxcmVpb0pFZ2N2YlM4d2JXdDZLQUEqKggAKiYICiIgQ0JBU0Vnb0lMMjB2TURkak1YWVNBbVZ1R2dKVlV5Z0FQAVAB?hl=en-US&gl=US&ceid=US%3Aen',
+        'Technology': 'https://news.google.com/topics/CAAqJggKIiBDQkFTRWdvSUwyMHZNRGRqTVhZU0FtVnVHZ0pWVXlnQVAB?hl=en-US&gl=US&ceid=US%3Aen',
+        'Science': 'https://news.google.com/topics/CAAqJggKIiBDQkFTRWdvSUwyMHZNRFp0Y1RjU0FtVnVHZ0pWVXlnQVAB?hl=en-US&gl=US&ceid=US%3Aen',
+        'Business': 'https://news.google.com/topics/CAAqJggKIiBDQkFTRWdvSUwyMHZNRGx6TVdZU0FtVnVHZ0pWVXlnQVAB?hl=en-US&gl=US&ceid=US%3Aen',
+        'World': 'https://news.google.com/topics/CAAqJggKIiBDQkFTRWdvSUwyMHZNRGx1YlY4U0FtVnVHZ0pWVXlnQVAB?hl=en-US&gl=US&ceid=US%3Aen',
+        'Health': 'https://news.google.com/topics/CAAqIQgKIhtDQkFTRGdvSUwyMHZNR3QwTlRFU0FtVnVLQUFQAQ?hl=en-US&gl=US&ceid=US%3Aen',
+    }
 
     def __init__(self, 
                  *, 
-                 browser_context: BrowserContext,
-                 debug: bool = False
+                 browser_context: BrowserContext | None = None,
+                 topics: dict[str, str] | None = None,
+                 debug: bool = False,
+                 memo: bool = True,
+                 extract_content: bool = True,
+                 stream_cleaning: bool = False,
+                 on_partial_text: Callable[[str, str], None] | None = None,
+                 url_index: UrlIndex | None = None,
+                 fetcher: 'AsyncArticleFetcher | None' = None,
+                 recorder: 'FixtureRecorder | None' = None,
+                 ocr_pool: 'OcrWorkerPool | None' = None,
+                 save_screenshots: bool = False,
+                 preprocessor: ImagePreprocessor | None = None,
+                 wait_until: Literal['load', 'domcontentloaded'] = 'load',
+                 max_tabs: int = 4,
+                 concurrent_analysis: bool = False
                  ):
         self._browser_context = browser_context
+        self.fetcher = fetcher
+        self.recorder = recorder
+        self.url_index = url_index
+        self._seen_lock = threading.Lock()
+        self._source_links: dict[str, str] = {}  # canonical article URL -> Google News link it was loaded from
         self._debug = debug
+        self._save_screenshots = save_screenshots or debug
+        self.preprocessor = preprocessor  # crops/tiles/downscales the screenshots before the models see them
+        self.wait_until: Literal['load', 'domcontentloaded'] = wait_until  # when the HTML of a clicked article is taken
+        self.pages = PageManager(max_tabs=max_tabs)  # article tabs opened by clicking
+        self.concurrent_analysis = concurrent_analysis  # runs the VLM and OCR on each screenshot at once
         self.logger = Logger()
-        self.scraper = NewsPageScraper()
+        self.scraper = NewsPageScraper(memo=memo, extract_content=extract_content, stream=stream_cleaning, on_text=on_partial_text)
         self.cache = Cache()
-        self._torch_device = torch_device()
-        self.florence = {
-            'model': AutoModelForCausalLM.from_pretrained('microsoft/Florence-2-base', trust_remote_code=True).eval().to(self._torch_device),
-            'processor': AutoProcessor.from_pretrained('microsoft/Florence-2-base', trust_remote_code=True)
-        }
-        self.urls = {
-            # Google News -> Technology -> AI
-            'AI': 'https://news.google.com/topics/CAAqKggKIiRDQkFTRlFvSUwyMHZNRGRqTVhZU0JXVnVMVWRDR2dKSlRDZ0FQAQ/sections/CAQiQ0NCQVNMQW9JTDIwdk1EZGpNWFlTQW1WdUdnSlZVeUlOQ0FRYUNRb0hMMjB2TUcxcmVpb0pFZ2N2YlM4d2JXdDZLQUEqKggAKiYICiIgQ0JBU0Vnb0lMMjB2TURkak1YWVNBbVZ1R2dKVlV5Z0FQAVAB?hl=en-US&gl=US&ceid=US%3Aen'
-        }
-
-    def _draw_ocr_bboxes(self, image: PillowImage, img_path: str, prediction: dict) -> None:
+        self.gateway = ModelGateway()
+        self.tracer = Tracer()
+        self.florence = ocr_pool or Florence()  # in-process, the model itself is loaded on first OCR
+        self._ocr_workers = ocr_pool.capacity if ocr_pool else 1  # enough OCR stage workers to fill the pool's batches
+        self.title_matcher = TitleMatcher()
+        self.analysis_memo = FingerprintMemo()  # fingerprint -> (titles, points to click)
+        self.urls = topics or {'AI': self.TOPICS['AI']}
+
+    def _draw_ocr_bboxes(self, screenshot: Screenshot, prediction: dict) -> None:
         colormap = ['blue','orange','green','purple','brown','pink','gray','olive','cyan','red',
                     'lime','indigo','violet','aqua','magenta','coral','gold','tan','skyblue']
+        image = screenshot.image.copy()  # the decoded screenshot is shared with the other stages
         draw = ImageDraw.Draw(image)
         bboxes, labels = prediction['quad_boxes'], prediction['labels']
         for box, label in zip(bboxes, labels):
@@ -65,52 +115,49 @@ class GoogleNewsReader:
             new_box = np.array(box).tolist()
             draw.polygon(new_box, width=3, outline=color)                                           # pyright: ignore[reportArgumentType]
             draw.text((new_box[0]+8, new_box[1]+2), "{}".format(label), align="right", fill=color)  # pyright: ignore[reportOperatorIssue, reportIndexIssue]
-        file_name = f"DEBUG_google_news_{img_path.split('/')[-1].split('.')[0]}.png"
-        image.save(os.path.join(self.cache.directory, file_name))
+        file_name = f"DEBUG_google_news_{screenshot.stem}.png"
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+        self.cache.write(file_name, buffer.getvalue(), kind='ocr_overlay')
         self.logger.debug(f"Saved: {file_name}") 
         
-    def _ocr_and_bounding_boxes(self, img_path: str) -> list[tuple[str, list[float]]]:
-        prompt = '<OCR_WITH_REGION>'
-        image = Image.open(img_path).convert('RGB')
-        model = self.florence['model']
-        processor = self.florence['processor']
-        inputs = processor(text=prompt, images=image, return_tensors="pt").to(self._torch_device)
-        generated_ids = model.generate(
-            input_ids=inputs["input_ids"].to(self._torch_device),
-            pixel_values=inputs["pixel_values"].to(self._torch_device),
-            max_new_tokens=1024,
-            early_stopping=False,
-            do_sample=False,
-            num_beams=3,
-        )
-        generated_text = processor.batch_decode(generated_ids, skip_special_tokens=False)[0]
-        parsed_answer: dict = processor.post_process_generation(
-            generated_text, 
-            task=prompt, 
-            image_size=(image.width, image.height)
-        )
+    def _ocr_and_bounding_boxes(self, screenshot: Screenshot, *, cancel: threading.Event | None = None) -> list[tuple[str, list[float]]]:
+        with self.tracer.span('ocr', image=screenshot.name) as span:
+            prediction = self._ocr_prediction(screenshot, cancel=cancel)
+            span.set(boxes=len(prediction['labels']))
+            if cancel is not None and cancel.is_set():
+                span.set(cancelled=True)
+                return []  # stopped early, the output is partial
+        if self.recorder:
+            self.recorder.record_ocr(screenshot, prediction)
         output: list[tuple[str, list[float]]] = []
-        for text, bbox in zip(parsed_answer[prompt]['labels'], parsed_answer[prompt]['quad_boxes']):
+        for text, bbox in zip(prediction['labels'], prediction['quad_boxes']):
             text = cast(str, text).strip()
             bbox = cast(list[float], bbox)  # [x1, y1, x2, y2, x3, y3, x4, y4]
             if text.startswith('</s>'): text.replace('</s>','')
             output.append((text, bbox))
         
         if self._debug:
-            self._draw_ocr_bboxes(image, img_path, parsed_answer[prompt])
+            self._draw_ocr_bboxes(screenshot, prediction)
 
         return output
     
-    def _bbox_center(self, 
-                     coords: list[float] # [x1, y1, x2, y2, x3, y3, x4, y4]
-                     ) -> tuple[int, int]:
-        x_coords = coords[0::2]  # Extract x coordinates (every 2nd value starting from 0)
-        y_coords = coords[1::2]  # Extract y coordinates (every 2nd value starting from 1)
-        center_x = sum(x_coords) / 4  # Average of x coordinates
-        center_y = sum(y_coords) / 4  # Average of y coordinates
-        return int(round(center_x)), int(round(center_y))
-    
-    def _titles_from_image(self, img_path: str) -> list[str]:
+    def _ocr_prediction(self, screenshot: Screenshot, *, cancel: threading.Event | None = None) -> dict:
+        if not self.preprocessor:
+            return self.florence.ocr_with_region(screenshot.image, cancel=cancel)
+        # Boxes are mapped back to viewport coordinates, where they're clicked
+        prediction: dict[str, list] = {'labels': [], 'quad_boxes': []}
+        for tile in self.preprocessor.tiles(screenshot.image):
+            tile_prediction = self.florence.ocr_with_region(tile.image, cancel=cancel)
+            for label, bbox in zip(tile_prediction['labels'], tile_prediction['quad_boxes']):
+                bbox = tile.to_viewport(bbox)
+                if tile.owns(bbox):
+                    prediction['labels'].append(label)
+                    prediction['quad_boxes'].append(bbox)
+        return prediction
+
+    def _titles_from_image(self, screenshot: Screenshot, *, cancel: threading.Event | None = None) -> list[str] | None:
+        # Returns None if cancel was set before the VLM finished
         prompt = dedent(
             f"""
             ## Task
@@ -128,138 +175,425 @@ class GoogleNewsReader:
             }}
             ```
             """)
-        response = ollama.chat(
-            model='llama3.2-vision',
-            messages=[{'role': 'user', 'content': prompt, 'images': [img_path]}],
-            options={'temperature': 0.3},
-            format=Titles.model_json_schema(),
-        )['message']['content']
-        titles: list[str] = json.loads(response)['titles']
+        with self.tracer.span('vlm_titles', image=screenshot.name) as span:
+            image = self.preprocessor.region(screenshot.image).png() if self.preprocessor else screenshot.png
+            request = dict(
+                model=self.VLM_MODEL,
+                messages=[{'role': 'user', 'content': prompt, 'images': [image]}],
+                options={'temperature': 0.3},
+                format=Titles.model_json_schema(),
+            )
+            if cancel is None:
+                response = self.gateway.chat(**request)['message']['content']
+            else:
+                # Streamed, so the gateway stops waiting for it as soon as cancel is set, and closes it
+                if cancel.is_set(): return None
+                parts = self.gateway.chat(**request, stream=True, cancel=cancel)
+                try:
+                    response = ''.join(part['message']['content'] for part in parts)
+                finally:
+                    parts.close()
+                if cancel.is_set():
+                    span.set(cancelled=True)
+                    return None
+            titles: list[str] = json.loads(response)['titles']
+            span.set(titles=len(titles))
+        if self.recorder:
+            self.recorder.record_titles(screenshot, titles)
         return titles
     
-    def _filter_ocr_texts_and_bboxes(self, texts_and_bboxes: list[tuple[str, list[float]]]) -> list[tuple[str, list[float]]]:
+    def _filter_ocr_texts_and_bboxes(self, 
+                                     texts_and_bboxes: list[tuple[str, list[float]]], 
+                                     *, 
+                                     min_words: int = 3
+                                     ) -> list[tuple[str, list[float]]]:
         # bbox: [x1, y1, x2, y2, x3, y3, x4, y4]
         remaining: list[tuple[str, list[float]]] = []
         for text, bbox in texts_and_bboxes:
             highest_y = max(bbox[1::2])  # lowest y on screen
             words = [w for w in text.split(' ') if w]
-            if len(words) > 2 and highest_y > 110:  # avoiding the Google News top bar
+            if len(words) >= min_words and highest_y > 110:  # avoiding the Google News top bar
                 remaining.append((text, bbox))
         self.logger.debug(f'Texts/BBoxes filter: {len(remaining)}/{len(texts_and_bboxes)} remaining')
         return remaining
     
-    def _analyze_single_screenshot(self, img_path: str) -> list[tuple[int, int]]:
-        with tqdm(total=2, desc=f'Analyzing image {img_path.split("/")[-1]}') as bar:
-            def empty_response() -> list[tuple[int, int]]:
-                bar.n = 2
-                bar.refresh()
-                return []
-            
+    def _click_points(self, screenshot: Screenshot, titles: list[str]) -> list[tuple[int, int]]:
+        return self._match_titles(screenshot, titles, self._ocr_candidates(screenshot))
+
+    def _ocr_candidates(self, screenshot: Screenshot, *, cancel: threading.Event | None = None) -> list[tuple[str, list[float]]]:
+        texts_and_bboxes = self._ocr_and_bounding_boxes(screenshot, cancel=cancel)
+        # Short fragments are kept, as the matcher merges headlines split across lines
+        return self._filter_ocr_texts_and_bboxes(texts_and_bboxes, min_words=1)
+
+    def _match_titles(self, 
+                      screenshot: Screenshot, 
+                      titles: list[str], 
+                      texts_and_bboxes: list[tuple[str, list[float]]]
+                      ) -> list[tuple[int, int]]:
+        if not texts_and_bboxes: return []
+        if self._debug:
+            self._save_ocr_record(screenshot, titles, texts_and_bboxes)
+
+        matches = self.title_matcher.match(titles, texts_and_bboxes)
+        for match in matches:
+            self.logger.debug(f"Matched title \"{match['title']}\" to \"{match['text']}\" at {match['point']} (confidence {match['confidence']:.2f})")
+        self.logger.debug(f'Matched {len(matches)}/{len(titles)} titles to OCR texts')
+        return [match['point'] for match in matches]
+
+    def _save_ocr_record(self, screenshot: Screenshot, titles: list[str], texts_and_bboxes: list[tuple[str, list[float]]]) -> None:
+        # Recorded OCR outputs are the input of benchmarks/title_matcher.py
+        file_name = f"DEBUG_ocr_{screenshot.stem}.json"
+        record = {'titles': titles, 'texts_and_bboxes': texts_and_bboxes}
+        self.cache.write(file_name, json.dumps(record).encode('utf8'), kind='ocr_record')
+        self.logger.debug(f"Saved: {file_name}")
+
+    def _detect_titles(self, frame: ScreenshotFrame) -> ScreenshotFrame | None:
+        # Pipeline stage: runs the VLM on the screenshot, unless a near-identical one was already analyzed
+        with self.logger.context(scroll=frame['scroll']):
+            memoized = self.analysis_memo.get(frame['fingerprint'])
+            if memoized is not None:
+                frame['titles'], frame['points'] = memoized
+                self.logger.debug(f"Section {frame['screenshot']}: same as a previously analyzed screenshot, points = {frame['points']}")
+                return frame if frame['points'] else None
+            frame['titles'] = self._titles_from_image(frame['screenshot'])
+            self.logger.debug(f"Section {frame['screenshot']}: {len(frame['titles'])} titles from image = {frame['titles']}")
+            if not frame['titles']:
+                self.analysis_memo.put(frame['fingerprint'], ([], []))
+                self.logger.warning(f"Found no titles in screenshot: {frame['screenshot']}")
+                return None
+            return frame
+
+    def _locate_titles(self, frame: ScreenshotFrame) -> ScreenshotFrame | None:
+        # Pipeline stage: runs OCR and maps the detected titles to points on the screen
+        with self.logger.context(scroll=frame['scroll']):
+            if frame['points']: return frame  # memoized
+            frame['points'] = self._click_points(frame['screenshot'], frame['titles'])
+            self.analysis_memo.put(frame['fingerprint'], (frame['titles'], frame['points']))
+            self.logger.debug(f"Points to click in scroll {frame['scroll']}: {frame['points']}")
+            if not frame['points']:
+                self.logger.warning(f"Found no titles to click in screenshot: {frame['screenshot']}")
+                return None
+            return frame
+
+    def _analyze_frame(self, frame: ScreenshotFrame, ocr_executor: ThreadPoolExecutor) -> ScreenshotFrame | None:
+        # Pipeline stage, with concurrent_analysis: runs OCR (in ocr_executor) while the VLM runs here, so a screenshot
+        # takes as long as the slower of the two. Either finding nothing cancels the other: the VLM finding no titles
+        # stops OCR at its next token, and OCR finding no text boxes stops waiting for the VLM at once.
+        with self.logger.context(scroll=frame['scroll']):
+            memoized = self.analysis_memo.get(frame['fingerprint'])
+            if memoized is not None:
+                frame['titles'], frame['points'] = memoized
+                self.logger.debug(f"Section {frame['screenshot']}: same as a previously analyzed screenshot, points = {frame['points']}")
+                return frame if frame['points'] else None
+            screenshot = frame['screenshot']
+            no_titles, no_boxes = threading.Event(), threading.Event()
+
+            def candidates() -> list[tuple[str, list[float]]]:
+                texts_and_bboxes = self._ocr_candidates(screenshot, cancel=no_titles)
+                if not texts_and_bboxes and not no_titles.is_set(): no_boxes.set()
+                return texts_and_bboxes
+
+            ocr = ocr_executor.submit(contextvars.copy_context().run, candidates)  # keeps the topic and scroll in its logs
             try:
-                titles = self._titles_from_image(img_path)
-                bar.update()
-                self.logger.debug(f'Section {img_path}: {len(titles)} titles from image = {titles}')
-                if not titles: return empty_response()
-                texts_and_bboxes = self._ocr_and_bounding_boxes(img_path)
-                texts_and_bboxes = self._filter_ocr_texts_and_bboxes(texts_and_bboxes)
-                bar.update()
-                if not texts_and_bboxes: return empty_response()
-
-                where_to_click: list[tuple[int, int]] = []
-                for title in titles:
-                    title = title.lower()
-                    indices = [i for i, (text, bbox) in enumerate(texts_and_bboxes) if text.lower() in title]
-                    if indices:
-                        bbox = texts_and_bboxes[indices[0]][1]
-                        center = self._bbox_center(bbox)
-                        where_to_click.append(center)
-                return where_to_click
-
-            except Exception as e:
-                self.logger.error(f'{e.__class__.__name__}: {e}', stack_lines=10)
-                return empty_response()
-        
-    def _index_to_section_image_name(self, i: int) -> str:
-        return self.SECTION_IMAGE_NAME_TEMPLATE.format(i=i)
+                titles = self._titles_from_image(screenshot, cancel=no_boxes)
+            except BaseException:
+                no_titles.set()
+                raise
+            if not titles:
+                no_titles.set()
+            texts_and_bboxes = ocr.result()  # quick once cancelled
+            if titles is None:
+                self.logger.warning(f'Found no texts in screenshot, stopped the VLM: {screenshot}')
+            elif not titles:
+                self.logger.warning(f'Found no titles in screenshot: {screenshot}')
+            frame['titles'] = titles or []
+            self.logger.debug(f"Section {screenshot}: {len(frame['titles'])} titles from image = {frame['titles']}")
+            frame['points'] = self._match_titles(screenshot, frame['titles'], texts_and_bboxes) if titles else []
+            self.analysis_memo.put(frame['fingerprint'], (frame['titles'], frame['points']))
+            self.logger.debug(f"Points to click in scroll {frame['scroll']}: {frame['points']}")
+            if titles and not frame['points']:
+                self.logger.warning(f"Found no titles to click in screenshot: {screenshot}")
+            return frame if frame['points'] else None
+
+    def _index_to_section_image_name(self, i: int, topic: str) -> str:
+        # Topics read concurrently write their screenshots to the same cache directory
+        return self.SECTION_IMAGE_NAME_TEMPLATE.format(i=i, topic=re.sub(r'\W+', '_', topic))
     
     def _section_image_name_to_index(self, name: str) -> int:
-        escaped_template = re.escape(self.SECTION_IMAGE_NAME_TEMPLATE).replace(r'\{i\}', r'(\d+)')
+        escaped_template = re.escape(self.SECTION_IMAGE_NAME_TEMPLATE).replace(r'\{topic\}', r'\w+').replace(r'\{i\}', r'(\d+)')
         match = re.fullmatch(escaped_template, name)
         if match:
             return int(match.group(1))
         else:
             raise ValueError("The input string does not match the given template.")
 
-    def get_news(self,
-                 *,
-                 max_threads: int | None = 3,
-                 scrolls: int = 6
-                 ) -> dict[str, list[Article]]:
-        output: dict[str, list[Article]] = {}
-        for k, url in self.urls.items():
-            self.logger.info(f'Visiting {k}: {url}')
+    def _scroll_to(self, page: Page, y: float) -> None:
+        if page.evaluate('window.scrollY') != y:
+            page.evaluate('y => window.scrollTo({top: y, behavior: "instant"})', y)
+            page.wait_for_timeout(300)  # unlike sleep(), lets Playwright dispatch its events meanwhile
+
+    def _mark_seen(self, seen_urls: set[str], url: str, *, link: str | None = None, final: bool = True) -> bool:
+        # Returns False if the URL was already seen in this run, or harvested in a previous one (by the URL index).
+        # Articles are first looked up by the link they're opened from (final=False), then by the URL it led to,
+        # passing the link, which was marked seen by the first lookup. Called from both the browser thread and the fetch stage.
+        url = canonicalize_url(url)
+        with self._seen_lock:
+            if url in seen_urls and (link is None or url != canonicalize_url(link)): return False
+            seen_urls.add(url)
+        return not (self.url_index and self.url_index.contains(url, final=final))
+
+    def _link_at(self, page: Page, x: int, y: int) -> str | None:
+        return page.evaluate(
+            """([x, y]) => {
+                const element = document.elementFromPoint(x, y);
+                const link = element ? element.closest('a[href]') : null;
+                return link ? link.href : null;
+            }""", [x, y])
+
+    def _harvest(self, page: Page, frame: ScreenshotFrame, seen_urls: set[str]) -> list[tuple[str, str | None]]:
+        with self.tracer.span('harvest', scroll=frame['scroll'], points=len(frame['points'])) as span, self.logger.context(scroll=frame['scroll']):
+            raw_pages = self._harvest_frame(page, frame, seen_urls)
+            rss = self.pages.sample_rss()
+            span.set(pages=len(raw_pages), **({'browser_rss_mb': rss / 2**20} if rss is not None else {}))
+        return raw_pages
 
-            google_news_page = self._browser_context.new_page()
+    def _harvest_frame(self, page: Page, frame: ScreenshotFrame, seen_urls: set[str]) -> list[tuple[str, str | None]]:
+        # Returns the (url, html) of each newly opened page. With the async engine, the html is left as None,
+        # to be loaded concurrently by the fetcher; points without a link fall back to clicking.
+        # Later scrolls may have been captured already, so the frame's scroll position is restored first.
+        page.bring_to_front()
+        self._scroll_to(page, frame['scroll_y'])
+
+        not_google_news_url_re_pattern = re.compile(r"^(?!https?:\/\/(?:www\.)?news\.google\.com).*$")
+
+        def url_not_from_google_news(new_page) -> bool:
+            new_page.wait_for_url(not_google_news_url_re_pattern, wait_until=self.wait_until)
+            return 'news.google.com' not in domain_of_url(new_page.url)
+
+        raw_pages: list[tuple[str, str | None]] = []
+        for x,y in frame['points']:
+            # Looked up before loading anything; the URL the link leads to is looked up once it's loaded
+            link = self._link_at(page, x, y)
+            if link and not self._mark_seen(seen_urls, link, final=False):
+                self.logger.debug(f'Already opened {link}, skipping')
+                continue
+            if link and self.fetcher:
+                self.logger.debug(f'Queued link at ({x}, {y}): {link}')
+                raw_pages.append((link, None))
+                continue
+            self.logger.debug(f'Clicking on ({x}, {y})')
+            self.pages.limit(page.context, keep=page)
+            try:
+                with page.context.expect_page(predicate=url_not_from_google_news) as page_info:
+                    page.mouse.click(x, y)
+            except PlaywrightTimeoutError as e:
+                self.logger.error(f'No page opened after clicking on ({x},{y})! | {e.__class__.__name__}: {e}')
+                continue
+            new_page = page_info.value
+            self.logger.debug(f'Opened new page: {new_page.url}')
+            if self._mark_seen(seen_urls, new_page.url, link=link):
+                new_page.bring_to_front()
+                html = new_page.content()
+                page_url = new_page.url
+                raw_pages.append((page_url, html))
+                if link:
+                    with self._seen_lock:
+                        self._source_links[canonicalize_url(page_url)] = link
+                if self.recorder:
+                    self.recorder.record_page(page_url, html)
+            else:
+                self.logger.debug('Already opened this URL, skipping')
+            self.pages.close(new_page)  # its HTML is all that's needed
+            page.bring_to_front()
+
+        if not raw_pages:
+            self.logger.warning(f"No pages opened in scroll {frame['scroll']}!")
+        return raw_pages
+
+    def _fetch_page(self, raw_page: tuple[str, str | None], seen_urls: set[str]) -> tuple[str, str] | None:
+        # Pipeline stage: loads pages queued by the async engine, passes clicked pages as they are
+        url, html = raw_page
+        if html is not None: return url, html
+        with self.logger.context(article=url):
+            assert self.fetcher is not None
+            with self.tracer.span('fetch', url=url):
+                fetched = self.fetcher.fetch(url).result()
+            if fetched is None: return None
+            if not self._mark_seen(seen_urls, fetched[0], link=url):
+                self.logger.debug(f'Already opened {fetched[0]}, skipping')
+                return None
+            self.logger.debug(f'Loaded page: {fetched[0]}')
+            if self.recorder:
+                self.recorder.record_page(fetched[0], fetched[1], source=url)
+            with self._seen_lock:
+                self._source_links[canonicalize_url(fetched[0])] = url
+            return fetched
+
+    def _clean_page(self, raw_page: tuple[str, str]) -> Article:
+        # Pipeline stage: extracts the article using the LLM
+        url, html = raw_page
+        with self.logger.context(article=url):
+            return self.scraper.from_html(html, url)
+
+    def _read_topic(self, 
+                    topic: str, 
+                    url: str, 
+                    *, 
+                    max_threads: int | None, 
+                    scrolls: int, 
+                    queue_size: int,
+                    skip_urls: set[str],
+                    browser_context: BrowserContext | None = None,
+                    stop: threading.Event | None = None
+                    ) -> Iterator[Article]:
+        # Topics read concurrently (by TopicScheduler) each pass a browser context of their own, and a stop event,
+        # which ends the reading at the next scroll or article, without waiting for the queued work
+        browser_context = browser_context or self._browser_context
+        assert browser_context is not None, 'No browser context to read topics in'
+        self.logger.info(f'Visiting {topic}: {url}')
+        with self.tracer.span('visit', topic=topic):
+            google_news_page = browser_context.new_page()
             google_news_page.goto(url)
             google_news_page.wait_for_load_state()
-            height: int = google_news_page.viewport_size['height']  # pyright: ignore[reportOptionalSubscript]
-            output[k] = []
+        height: int = google_news_page.viewport_size['height']  # pyright: ignore[reportOptionalSubscript]
+
+        # capture -> title detection -> OCR/localisation -> click/harvest -> cleaning
+        # Capturing and harvesting drive the browser, so they run here; the rest run in background threads.
+        ocr_executor: ThreadPoolExecutor | None = None
+        if self.concurrent_analysis:
+            # A single stage: the VLM runs in the stage's threads, OCR in the executor's, at the same time
+            executor = ocr_executor = ThreadPoolExecutor(max_workers=self._ocr_workers, thread_name_prefix=f'{topic}:ocr')
+            analysis_stages = [Stage('analysis', lambda frame: self._analyze_frame(frame, executor), workers=self._ocr_workers)]
+        else:
+            analysis_stages = [Stage('titles', self._detect_titles), Stage('ocr', self._locate_titles, workers=self._ocr_workers)]
+        analysis = Pipeline(analysis_stages, maxsize=queue_size, name=f'{topic}:analysis')
+        articles: deque[Article] = deque()  # cleaned, waiting to be yielded
+        articles_count = 0
+        seen_urls: set[str] = {canonicalize_url(u) for u in skip_urls}
+        cleaning_stages = [Stage('cleaning', self._clean_page, workers=max_threads or 1)]
+        if self.fetcher:
+            fetching = Stage('fetch', lambda raw_page: self._fetch_page(raw_page, seen_urls), workers=self.fetcher.max_tabs)
+            cleaning_stages.insert(0, fetching)
+        cleaning = Pipeline(cleaning_stages, maxsize=max(queue_size, max_threads or 1), name=f'{topic}:cleaning')
+        capture_y: float = 0
+        previous_fingerprint: int | None = None
+
+        def collect(article: Article) -> None:
+            nonlocal articles_count
+            if self.url_index:
+                with self._seen_lock:
+                    source_link = self._source_links.pop(canonicalize_url(article['url']), None)
+                self.url_index.add(article['url'], *([source_link] if source_link else []))
+            articles.append(article)
+            articles_count += 1
+            self.logger.info(f'Extracted article {articles_count} of {topic}: {article["url"]}')
+
+        def stopped() -> bool:
+            if stop is None or not stop.is_set(): return False
+            self.logger.info(f'Stopped reading {topic}, after {articles_count} articles')
+            return True
+
+        def harvest(frame: ScreenshotFrame) -> None:
+            for raw_page in self._harvest(google_news_page, frame, seen_urls):
+                while True:
+                    try:
+                        cleaning.put(raw_page, timeout=0.5)
+                        break
+                    except queue.Full:
+                        for article in cleaning.ready(): collect(article)
+            for article in cleaning.ready(): collect(article)
+
+        with ocr_executor or nullcontext(), analysis, cleaning:  # the executor is shut down after the stages using it
             for scroll in range(scrolls):
+                for frame in analysis.ready(): harvest(frame)
+                while articles: yield articles.popleft()
+                if stopped(): return  # leaving the pipelines shuts them down
                 google_news_page.bring_to_front()
+                self._scroll_to(google_news_page, capture_y)
                 if scroll > 0: 
                     google_news_page.mouse.wheel(0, height)
-                    sleep(1)
+                    google_news_page.wait_for_timeout(1000)
+                previous_y, capture_y = capture_y, google_news_page.evaluate('window.scrollY')
                 
-                screenshot_path = os.path.join(self.cache.directory, self._index_to_section_image_name(scroll))
-                google_news_page.screenshot(path=screenshot_path)
-                self.logger.debug(f"Analyzing screenshot of scroll {scroll}: {screenshot_path}")
-
-                points_to_click = self._analyze_single_screenshot(screenshot_path)
-                self.logger.debug(f'Points to click: {points_to_click}')
-                if not points_to_click:
-                    self.logger.warning(f"Found no titles to click in screenshot: {screenshot_path}")
-                    continue
-
-                raw_pages: list[tuple[str, str]] = []
-                not_google_news_url_re_pattern = re.compile(r"^(?!https?:\/\/(?:www\.)?news\.google\.com).*$")
-
-                def url_not_from_google_news(page) -> bool:
-                    nonlocal not_google_news_url_re_pattern
-                    page.wait_for_url(not_google_news_url_re_pattern)
-                    return 'news.google.com' not in domain_of_url(page.url)
-
-                for x,y in points_to_click:
-                    self.logger.debug(f'Clicking on ({x}, {y})')
+                name = self._index_to_section_image_name(scroll, topic)
+                with self.tracer.span('capture', scroll=scroll):
+                    # Kept in memory, and written to the cache directory only if asked to
+                    png = google_news_page.screenshot()
+                    screenshot = Screenshot(png, name=name,
+                                            path=self.cache.write(name, png, kind='screenshot') if self._save_screenshots else None)
+                    fingerprint = dhash(screenshot.image)
+                if previous_fingerprint is not None and (
+                        capture_y == previous_y or 
+                        hamming_distance(fingerprint, previous_fingerprint) <= self.END_OF_FEED_DISTANCE):
+                    self.logger.info(f'Scroll {scroll} shows the same content as the previous one, assuming end of feed')
+                    break
+                previous_fingerprint = fingerprint
+                if self.recorder:
+                    self.recorder.record_frame(topic, scroll, screenshot)
+                self.logger.debug(f"Queued screenshot of scroll {scroll}: {screenshot}")
+                frame = ScreenshotFrame(scroll=scroll, screenshot=screenshot, scroll_y=capture_y, fingerprint=fingerprint, titles=[], points=[])
+                while True:
                     try:
-                        with self._browser_context.expect_page(predicate=url_not_from_google_news) as page_info:
-                            google_news_page.mouse.click(x, y)
-                    except PlaywrightTimeoutError as e:
-                        self.logger.error(f'No page opened after clicking on ({x},{y})! | {e.__class__.__name__}: {e}')
-                        continue
-                    new_page = page_info.value
-                    self.logger.debug(f'Opened new page: {new_page.url}')
-                    if new_page.url not in [a['url'] for a in output[k]]:
-                        new_page.bring_to_front()
-                        html = new_page.content()
-                        page_url = new_page.url
-                        raw_pages.append((page_url, html))
-                    else:
-                        self.logger.debug('Already opened this URL, skipping')
-                    google_news_page.bring_to_front()
-                
-                if not raw_pages:
-                    self.logger.warning("No pages opened!")
-                    continue
-
-                u_list, h_list = tuple(zip(*raw_pages))
-                u_list = cast(list[str], u_list)
-                h_list = cast(list[str], h_list)
-                articles: list[Article] = []
-                with ThreadPoolExecutor(max_workers=max_threads) as executor:
-                    results = list(tqdm(executor.map(self.scraper.from_html, h_list, u_list), desc="Cleaning texts", total=len(u_list)))
-                for result in results:
-                    articles.append(result)
-                self.logger.info(f'Extracted {len(articles)} articles from scroll {scroll}/{scrolls}')
-                output[k].extend(articles)
+                        analysis.put(frame, timeout=0.5)
+                        break
+                    except queue.Full:
+                        for ready_frame in analysis.ready(): harvest(ready_frame)
+                self.logger.debug(f'Queue depths: {analysis.depths()} | {cleaning.depths()}')
+
+            for frame in analysis.drain(): 
+                harvest(frame)
+                while articles: yield articles.popleft()
+                if stopped(): return
+            for article in cleaning.drain(): 
+                collect(article)
+                while articles: yield articles.popleft()
+                if stopped(): return
+
+        self.logger.info(f'Extracted {articles_count} articles from {topic}')
+        self.logger.debug(f'Max queue depths: {analysis.max_depths()} | {cleaning.max_depths()}')
+
+    def iter_news(self,
+                  *,
+                  max_threads: int | None = 3,
+                  scrolls: int = 6,
+                  queue_size: int = 2,
+                  skip_urls: Iterable[str] = ()
+                  ) -> Iterator[tuple[str, Article]]:
+        # Yields (topic, article) as soon as each article is cleaned
+        skip_urls = set(skip_urls)
+        for k, url in self.urls.items():
+            for article in self._read_topic(k, url, max_threads=max_threads, scrolls=scrolls, queue_size=queue_size, skip_urls=skip_urls):
+                yield k, article
+        self._log_summary()
+
+    def get_news(self,
+                 *,
+                 max_threads: int | None = 3,
+                 scrolls: int = 6,
+                 queue_size: int = 2
+                 ) -> dict[str, list[Article]]:
+        output: dict[str, list[Article]] = {k: [] for k in self.urls}
+        for k, article in self.iter_news(max_threads=max_threads, scrolls=scrolls, queue_size=queue_size):
+            output[k].append(article)
         return output
-    
\ No newline at end of file
+
+    def _log_summary(self) -> None:
+        for model, stats in self.gateway.stats().items():
+            self.logger.info(f"{model}: {stats['requests']:.0f} requests, {stats['retries']:.0f} retries, {stats['failures']:.0f} failures, {stats['wait_seconds']:.1f}s waiting for a slot")
+        if self.url_index:
+            stats = self.url_index.stats
+            self.logger.info(f"URL index: {stats['hits']} articles skipped as harvested in previous runs, {stats['misses']} new, {stats['size']} URLs indexed")
+        self.logger.info(f'Screenshot analysis memo: {self.analysis_memo.hits} hits, {self.analysis_memo.misses} misses')
+        if self.pages.peak_rss is not None:
+            recycled = f', {self.fetcher.recycled} article contexts recycled' if self.fetcher else ''
+            self.logger.info(f'Browsers: peak RSS {self.pages.peak_rss / 2**20:.0f}MB, {self.pages.closed} clicked article tabs closed{recycled}')
+        if self.scraper.extractor:
+            saved = self.scraper.raw_tokens - self.scraper.tokens
+            self.logger.info(f'Content extraction: {saved}/{self.scraper.raw_tokens} LLM input tokens saved ({saved / max(self.scraper.raw_tokens, 1):.0%})')
+        artifacts = self.cache.artifacts(run=self.cache.run)
+        if artifacts:
+            kinds = ', '.join(f'{count} {kind}' for kind, count in Counter(a['kind'] for a in artifacts).items())
+            self.logger.info(f"Cache: {len(artifacts)} artifacts written to {self.cache.directory} ({sum(a['bytes'] for a in artifacts) / 2**20:.1f}MB): {kinds}")
+        if self.scraper.memo:
+            stats = self.scraper.memo.stats
+            self.logger.info(f"Clean-text memo store: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
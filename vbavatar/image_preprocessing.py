@@ -0,0 +1,98 @@
+import io
+from typing import TYPE_CHECKING
+from .utils import lazy_import
+
+if TYPE_CHECKING:
+    from PIL.Image import Image as PillowImage
+
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+
+
+class Tile:
+    # A part of the screenshot, as sent to a model: cropped at (left, top) of the viewport and resized by scale.
+    # Boxes found in it are kept only if their center is within [own_top, own_bottom) of the viewport, so
+    # overlapping tiles don't report the same text twice.
+    def __init__(self, image: 'PillowImage', *, left: int, top: int, scale: float, own_top: float, own_bottom: float) -> None:
+        self.image = image
+        self.left = left
+        self.top = top
+        self.scale = scale
+        self.own_top = own_top
+        self.own_bottom = own_bottom
+
+    def to_viewport(self, bbox: list[float]) -> list[float]:
+        # bbox: [x1, y1, x2, y2, x3, y3, x4, y4], in tile pixels
+        return [v / self.scale + (self.left if i % 2 == 0 else self.top) for i, v in enumerate(bbox)]
+
+    def owns(self, viewport_bbox: list[float]) -> bool:
+        center_y = sum(viewport_bbox[1::2]) / 4
+        return self.own_top <= center_y < self.own_bottom
+
+    def png(self) -> bytes:
+        buffer = io.BytesIO()
+        self.image.save(buffer, format='PNG', compress_level=1)  # it's only sent to Ollama, encoding speed matters more than size
+        return buffer.getvalue()
+
+
+class ImagePreprocessor:
+    # Shrinks what the models have to look at: the Google News top bar is cropped off, and so are the page
+    # margins at the sides (columns of uniform color); then the content is optionally cut into overlapping
+    # tiles (Florence resizes its input to a square, squashing tall images) and downscaled.
+    TOP_BAR_HEIGHT = 110  # same as the filter of OCR boxes in GoogleNewsReader
+    MARGIN_PADDING = 8
+    MARGIN_MIN_STD = 4.0  # columns whose brightness varies less than this are empty page margins
+
+    def __init__(self,
+                 *,
+                 crop: bool = True,
+                 max_side: int | None = None,
+                 tile_height: int | None = None,
+                 tile_overlap: float = 0.15
+                 ) -> None:
+        self.crop = crop
+        self.max_side = max_side
+        self.tile_height = tile_height
+        self.tile_overlap = tile_overlap
+
+    def content_box(self, image: 'PillowImage') -> tuple[int, int, int, int]:
+        width, height = image.size
+        if not self.crop:
+            return 0, 0, width, height
+        top = min(self.TOP_BAR_HEIGHT, height - 1)
+        gray = np.asarray(image.convert('L'), dtype=np.float32)[top:]
+        busy = np.flatnonzero(gray.std(axis=0) > self.MARGIN_MIN_STD)
+        if busy.size == 0:
+            return 0, top, width, height
+        left = max(0, int(busy[0]) - self.MARGIN_PADDING)
+        right = min(width, int(busy[-1]) + 1 + self.MARGIN_PADDING)
+        return left, top, right, height
+
+    def _tile(self, image: 'PillowImage', left: int, top: int, own_top: float, own_bottom: float) -> Tile:
+        scale = 1.0
+        if self.max_side and max(image.size) > self.max_side:
+            scale = self.max_side / max(image.size)
+            image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.Resampling.LANCZOS)
+        return Tile(image, left=left, top=top, scale=scale, own_top=own_top, own_bottom=own_bottom)
+
+    def region(self, image: 'PillowImage') -> Tile:
+        # The whole content region as one image, for the VLM
+        left, top, right, bottom = self.content_box(image)
+        return self._tile(image.crop((left, top, right, bottom)), left, top, float('-inf'), float('inf'))
+
+    def tiles(self, image: 'PillowImage') -> list[Tile]:
+        # The content region, cut into overlapping tiles of up to tile_height viewport pixels, for OCR
+        left, top, right, bottom = self.content_box(image)
+        if not self.tile_height or bottom - top <= self.tile_height:
+            return [self.region(image)]
+        overlap = int(self.tile_height * self.tile_overlap)
+        step = self.tile_height - overlap
+        starts = list(range(top, bottom - self.tile_height, step)) + [bottom - self.tile_height]
+        tiles: list[Tile] = []
+        for i, start in enumerate(starts):
+            # Each tile owns the viewport rows up to the middle of its overlaps with its neighbours
+            own_top = float('-inf') if i == 0 else (start + starts[i - 1] + self.tile_height) / 2
+            own_bottom = float('inf') if i == len(starts) - 1 else (starts[i + 1] + start + self.tile_height) / 2
+            crop = image.crop((left, start, right, start + self.tile_height))
+            tiles.append(self._tile(crop, left, start, own_top, own_bottom))
+        return tiles
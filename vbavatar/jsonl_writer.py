@@ -0,0 +1,77 @@
+import os
+import json
+import threading
+from typing import Any, IO
+from .logger import Logger
+
+
+class JsonlWriter:
+    # Writes one JSON record per line, flushing each to disk right away, so a crash loses nothing already written
+    def __init__(self, path: str, *, append: bool = False) -> None:
+        self.logger = Logger()
+        self.path = path
+        self.append = append
+        self.count = 0
+        self._file: IO[str] | None = None
+
+    @staticmethod
+    def read(path: str) -> list[dict[str, Any]]:
+        records: list[dict[str, Any]] = []
+        with open(path, 'r', encoding='utf8') as f:
+            for i, line in enumerate(f):
+                if not line.strip(): continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    Logger().warning(f'Skipping malformed line {i+1} of {path}')
+        return records
+
+    def _truncate_partial_line(self) -> None:
+        # A crash may have left half a record at the end of the file, which the next record would be glued to
+        with open(self.path, 'rb+') as f:
+            content = f.read()
+            if content and not content.endswith(b'\n'):
+                f.truncate(content.rfind(b'\n') + 1)
+                self.logger.warning(f'Removed a partially written record from the end of {self.path}')
+
+    def __enter__(self) -> 'JsonlWriter':
+        if self.append and os.path.exists(self.path):
+            self._truncate_partial_line()
+        self._file = open(self.path, 'a' if self.append else 'w', encoding='utf8')
+        return self
+
+    def __exit__(self, *args) -> None:
+        if self._file: self._file.close()
+        self._file = None
+
+    def write(self, record: dict[str, Any]) -> None:
+        assert self._file is not None, f'{self.__class__.__name__} must be entered before writing'
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.count += 1
+
+
+class PartialTextWriter:
+    # Called with each piece of cleaned text as the LLM generates it (NewsPageScraper's on_text), writes the text
+    # of every article as it's finished line by line, in records of {'url', 'text'}, so the beginning of a long
+    # article can be read before the article is done. Joining the texts of a URL gives its whole text;
+    # finish() writes the rest of it, once the article itself is written.
+    def __init__(self, writer: JsonlWriter) -> None:
+        self.writer = writer
+        self._pending: dict[str, str] = {}  # url -> text not written yet
+        self._lock = threading.Lock()  # articles are cleaned concurrently
+
+    def __call__(self, url: str, piece: str) -> None:
+        with self._lock:
+            text = self._pending.get(url, '') + piece
+            end = text.rfind('\n') + 1  # blank lines are held back, until there's text after them
+            if text[:end].strip():
+                self.writer.write({'url': url, 'text': text[:end]})
+                text = text[end:]
+            self._pending[url] = text
+
+    def finish(self, url: str) -> None:
+        with self._lock:
+            rest = self._pending.pop(url, '')
+            if rest.strip(): self.writer.write({'url': url, 'text': rest})
@@ -1,10 +1,21 @@
 import sys
-import inspect
+import json
+import queue
+import atexit
 import logging
-from typing import Literal
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Iterator, Literal
 from . import PACKAGE_NAME
 from .singleton_metaclass import SingletonMeta
 
+# Fields of the current unit of work (topic, scroll, article), added to the JSON-lines records.
+# Pipeline stage threads start with a copy of the context of the thread that created the pipeline.
+log_context: contextvars.ContextVar[dict[str, Any]] = contextvars.ContextVar('log_context', default={})
+
 
 class ColorFormatter(logging.Formatter):
     RED = "\033[31m"
@@ -24,8 +35,10 @@ class ColorFormatter(logging.Formatter):
 
         formatted = super().format(record)
 
-        # If we have additional stack lines stored in the record, append them now,
-        # ensuring they're placed AFTER the [filename:lineno] part.
+        # The caller goes right after the message, and the additional stack lines, if any, after it
+        caller = getattr(record, 'caller', '')
+        if caller:
+            formatted += f" ({caller})"
         stack_lines = getattr(record, 'stack_lines', '')
         if stack_lines:
             formatted += "\n" + stack_lines
@@ -34,11 +47,38 @@ class ColorFormatter(logging.Formatter):
 
         return formatted
 
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry: dict[str, Any] = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'caller': getattr(record, 'caller', ''),
+            'thread': record.threadName,
+            'run': getattr(record, 'run', None),
+            **getattr(record, 'context', {}),
+        }
+        stack_lines = getattr(record, 'stack_lines', '')
+        if stack_lines:
+            entry['stack'] = stack_lines
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
 class Logger(logging.Logger, metaclass=SingletonMeta):
+    # Records are checked against the level before anything else, and are formatted and written by a background
+    # listener thread, so logging calls never wait for the console or the disk
     _LINES_TO_LOG = {
         'ERROR': 3,
         'CRITICAL': 3,
     }
+    _LEVELS = {
+        'debug': logging.DEBUG,
+        'info': logging.INFO,
+        'warning': logging.WARNING,
+        'error': logging.ERROR,
+        'critical': logging.CRITICAL,
+    }
 
     def __new__(cls, *args, **kwargs):
         instance = super().__new__(cls)
@@ -52,21 +92,64 @@ class Logger(logging.Logger, metaclass=SingletonMeta):
 
     def _initialize_logger(self):
         self._initialized = True
+        self.run_id: str | None = None
         self.handlers.clear()
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setLevel(logging.DEBUG)
         formatter = ColorFormatter('%(asctime)s - %(levelname)s: %(message)s')
         console_handler.setFormatter(formatter)
-        self.addHandler(console_handler)
-
-    def _log_last_lines(self, lines: int) -> tuple[str, str]:
-        stack = inspect.stack()[3:]  # 0 = _log_last_lines, 1 = __log, 2 = debug/info/warning/error/critical, 3 = original caller
-        lines = min(lines, len(stack))
-        last_x_frames = stack[:lines]
-        caller = last_x_frames.pop(0)
-        stack_lines = [f"\t{frame.filename} ({frame.function}:{frame.lineno})" for frame in last_x_frames]
+        self._output_handlers: list[logging.Handler] = [console_handler]
+        self._queue: queue.Queue = queue.Queue()
+        self._listener_lock = threading.Lock()
+        self._listener: QueueListener | None = None
+        self.addHandler(QueueHandler(self._queue))
+        self._start_listener()
+        atexit.register(self.flush)
+
+    def _start_listener(self) -> None:
+        with self._listener_lock:
+            if self._listener: self._listener.stop()  # writes out all queued records first
+            self._listener = QueueListener(self._queue, *self._output_handlers, respect_handler_level=True)
+            self._listener.start()
+
+    def add_json_output(self, path: str) -> None:
+        # Also writes every record as a JSON line, with the run and the current topic/scroll/article
+        handler = logging.FileHandler(path, encoding='utf8')
+        handler.setLevel(logging.DEBUG)
+        handler.setFormatter(JsonLinesFormatter())
+        self._output_handlers.append(handler)
+        self._start_listener()
+
+    def flush(self) -> None:
+        # Waits until every record logged so far is written
+        self._queue.join()
+        for handler in self._output_handlers:
+            handler.flush()
+
+    @contextmanager
+    def context(self, **fields: Any) -> Iterator[None]:
+        token = log_context.set({**log_context.get(), **fields})
+        try:
+            yield
+        finally:
+            log_context.reset(token)
+
+    def _caller_info(self, lines: int) -> tuple[str, str]:
+        # 0 = _caller_info, 1 = __log, 2 = debug/info/warning/error/critical, 3 = original caller.
+        # Walking the frames is cheap; inspect.stack() would also read the source file of each of them.
+        frame = sys._getframe(3)
+        caller = f"{frame.f_code.co_filename.split('/')[-1]}:{frame.f_code.co_name}:{frame.f_lineno}"
+        stack_lines: list[str] = []
+        frame = frame.f_back
+        while frame is not None and len(stack_lines) < lines - 1:
+            stack_lines.append(f"\t{frame.f_code.co_filename} ({frame.f_code.co_name}:{frame.f_lineno})")
+            frame = frame.f_back
         if stack_lines: stack_lines = ['Stack:'] + stack_lines
-        return f"({caller.filename.split('/')[-1]}:{caller.function}:{caller.lineno})", "\n".join(stack_lines)
+        return caller, "\n".join(stack_lines)
+
+    def findCaller(self, stack_info: bool = False, stacklevel: int = 1):
+        # The caller is already found by _caller_info, and passed with the record
+        return '(unknown file)', 0, '(unknown function)', None
 
     def set_level(self, level: str | int) -> None:
         self.setLevel(level)
@@ -82,14 +165,15 @@ class Logger(logging.Logger, metaclass=SingletonMeta):
             self._LINES_TO_LOG[l] = lines
 
     def __log(self, level: Literal['debug', 'info', 'warning', 'error', 'critical'], msg: str, *args, stack_lines: int | None = None, **kwargs) -> None:
+        levelno = self._LEVELS[level]
+        if not self.isEnabledFor(levelno):
+            return
         lines = stack_lines if stack_lines is not None else self._LINES_TO_LOG.get(level.upper(), 0)
-        kwargs.pop('stack_lines', None)
-        caller, stack_info = self._log_last_lines(lines+1)
-        msg = f'{msg} {caller}'
+        caller, stack_info = self._caller_info(lines+1)
         extra = kwargs.pop('extra', {})
-        extra['stack_lines'] = stack_info
+        extra.update(caller=caller, stack_lines=stack_info, run=self.run_id, context=log_context.get())
         kwargs['extra'] = extra
-        getattr(super(), level)(msg, *args, **kwargs)
+        self._log(levelno, msg, args, **kwargs)
 
     def debug(self, msg: str, *args, stack_lines: int | None = None, **kwargs) -> None:
         self.__log('debug', msg, *args, stack_lines=stack_lines, **kwargs)
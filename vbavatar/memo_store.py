@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Any
+from .cache import Cache
+from .logger import Logger
+
+
+class MemoStore:
+    _ROOT_DIR = 'memo'
+    _EVICTION_CHECK_BYTES = 8 * 1024 * 1024  # re-check the size budget after writing this many bytes
+
+    def __init__(self,
+                 *,
+                 namespace: str,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 max_age_seconds: float | None = 7 * 24 * 60 * 60
+                 ) -> None:
+        self.logger = Logger()
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._written_since_eviction = 0
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self.evict()
+
+    @property
+    def directory(self) -> str:
+        # Lives next to the per-run directories, so it survives between runs
+        return os.path.join(Cache().root, self._ROOT_DIR, self.namespace)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate}
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def _is_expired(self, created: float) -> bool:
+        return self.max_age_seconds is not None and time.time() - created > self.max_age_seconds
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit: self.hits += 1
+            else: self.misses += 1
+
+    def get(self, key: str) -> Any | None:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf8') as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            self._count(hit=False)
+            return None
+        except (OSError, ValueError):  # ValueError: malformed JSON, or text which isn't UTF-8
+            record = None
+        if not (isinstance(record, dict) and isinstance(record.get('created'), (int, float)) and 'value' in record):
+            # Written by another version, or corrupted: a miss, and removed so it's written again
+            self.logger.warning(f'Memo store [{self.namespace}]: removing malformed entry {path}')
+            self._remove(path)
+            self._count(hit=False)
+            return None
+        if self._is_expired(record['created']):
+            self._remove(path)
+            self._count(hit=False)
+            return None
+        os.utime(path)  # mtime doubles as last-access time for LRU eviction
+        self._count(hit=True)
+        return record['value']
+
+    def put(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = json.dumps({'created': time.time(), 'value': value}, ensure_ascii=False)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf8') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._written_since_eviction += len(payload)
+            should_evict = self._written_since_eviction >= self._EVICTION_CHECK_BYTES
+            if should_evict: self._written_since_eviction = 0
+        if should_evict:
+            self.evict()
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self) -> None:
+        entries: list[tuple[float, int, str]] = []  # (last access, size, path)
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if not filename.endswith('.json'): continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        removed = 0
+        if self.max_age_seconds is not None:
+            # mtime is refreshed on every hit, so this drops entries which were neither written nor read recently
+            oldest_allowed = time.time() - self.max_age_seconds
+            expired = [e for e in entries if e[0] < oldest_allowed]
+            for _, _, path in expired:
+                self._remove(path)
+            removed += len(expired)
+            entries = [e for e in entries if e[0] >= oldest_allowed]
+
+        total_bytes = sum(size for _, size, _ in entries)
+        entries.sort()
+        while entries and total_bytes > self.max_bytes:
+            _, size, path = entries.pop(0)
+            self._remove(path)
+            total_bytes -= size
+            removed += 1
+
+        if removed:
+            self.logger.debug(f'Memo store [{self.namespace}]: evicted {removed} entries, {total_bytes} bytes remaining')
@@ -0,0 +1,212 @@
+import time
+import queue
+import random
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, TypeVar
+from .logger import Logger
+from .singleton_metaclass import SingletonMeta
+from .tracing import Span, Tracer, _NoopSpan
+from .utils import lazy_import
+
+ollama = lazy_import('ollama')
+httpx = lazy_import('httpx')
+
+T = TypeVar('T')
+
+
+class ModelGateway(metaclass=SingletonMeta):
+    # All Ollama calls go through here: one client with pooled connections, a concurrency limit per model,
+    # a bound on queued requests (callers block beyond it), retries with jittered backoff, and keep_alive
+    # control so models stay resident between calls. In-process models (Florence) share the limits through run(),
+    # and max_inference caps the calls running at once across all models.
+    DEFAULT_CONCURRENCY = {
+        'llama3.2-vision': 1,
+        'llama3.1': 2,
+    }
+    _CANCEL_POLL_SECONDS = 0.05
+
+    def __init__(self,
+                 *,
+                 host: str | None = None,
+                 concurrency: dict[str, int] | None = None,
+                 max_pending: int = 16,
+                 max_inference: int | None = None,
+                 retries: int = 3,
+                 backoff_seconds: float = 1.0,
+                 keep_alive: str | float = '30m'
+                 ) -> None:
+        if getattr(self, "_initialized", False):
+            return
+        else:
+            super().__init__()
+            self._initialized = True
+            self.logger = Logger()
+            self.tracer = Tracer()
+            self._client = ollama.Client(host=host)  # holds a single httpx.Client, which pools connections
+            self.concurrency = {**self.DEFAULT_CONCURRENCY, **(concurrency or {})}
+            self.retries = retries
+            self.backoff_seconds = backoff_seconds
+            self.keep_alive = keep_alive
+            self._pending = threading.BoundedSemaphore(max_pending)
+            self._inference = threading.BoundedSemaphore(max_inference) if max_inference else None
+            self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+            self._lock = threading.Lock()
+            self._stats: dict[str, dict[str, float]] = {}
+
+    def _semaphore(self, model: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if model not in self._semaphores:
+                self._semaphores[model] = threading.BoundedSemaphore(self.concurrency.get(model, 1))
+                self._stats[model] = {'requests': 0, 'retries': 0, 'failures': 0, 'wait_seconds': 0.0}
+            return self._semaphores[model]
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {model: dict(stats) for model, stats in self._stats.items()}
+
+    @contextmanager
+    def slot(self, model: str) -> Iterator[None]:
+        semaphore = self._semaphore(model)
+        start = time.perf_counter()
+        try:
+            self._pending.acquire()  # backpressure: blocks while too many requests are already queued
+            try:
+                semaphore.acquire()
+                try:
+                    if self._inference: self._inference.acquire()  # acquired last, so every caller takes the locks in the same order
+                except BaseException:
+                    semaphore.release()
+                    raise
+            except BaseException:
+                self._pending.release()
+                raise
+        finally:
+            with self._lock:
+                self._stats[model]['wait_seconds'] += time.perf_counter() - start
+        try:
+            yield
+        finally:
+            if self._inference: self._inference.release()
+            semaphore.release()
+            self._pending.release()
+
+    def _is_retryable(self, e: Exception) -> bool:
+        if isinstance(e, ollama.ResponseError):
+            return e.status_code == 429 or e.status_code >= 500
+        return isinstance(e, (httpx.TransportError, ConnectionError))
+
+    def _with_retries(self, model: str, call: Callable[[], T]) -> T:
+        attempt = 0
+        while True:
+            try:
+                result = call()
+                with self._lock:
+                    self._stats[model]['requests'] += 1
+                return result
+            except Exception as e:
+                if attempt >= self.retries or not self._is_retryable(e):
+                    with self._lock:
+                        self._stats[model]['failures'] += 1
+                    raise
+                delay = self.backoff_seconds * 2 ** attempt * random.uniform(0.5, 1.5)
+                self.logger.warning(f'{model} request failed ({e.__class__.__name__}: {e}), retrying in {delay:.1f}s')
+                with self._lock:
+                    self._stats[model]['retries'] += 1
+                time.sleep(delay)
+                attempt += 1
+
+    def run(self, model: str, call: Callable[[], T]) -> T:
+        # For models running in-process: the same concurrency limits and stats as the Ollama requests
+        with self.slot(model):
+            return self._with_retries(model, call)
+
+    def _record_metrics(self, span: Span | _NoopSpan, response: Any) -> None:
+        # Ollama reports token counts, and durations in nanoseconds, with the (last part of the) response
+        metrics: dict[str, Any] = {}
+        for key in ('prompt_eval_count', 'eval_count'):
+            value = getattr(response, key, None)
+            if value is not None: metrics[key] = value
+        for key in ('prompt_eval_duration', 'eval_duration', 'load_duration'):
+            value = getattr(response, key, None)
+            if value is not None: metrics[f'{key}_seconds'] = value / 1e9
+        span.set(**metrics)
+
+    def chat(self, *, model: str, messages: list[dict], stream: bool = False, cancel: threading.Event | None = None, **kwargs) -> Any:
+        # A streamed response ends early once cancel is set
+        if stream:
+            parts = self._stream_chat(model=model, messages=messages, **kwargs)
+            return self._cancellable(parts, cancel) if cancel else parts
+        with self.tracer.span(f'ollama:{model}') as span, self.slot(model):
+            response = self._with_retries(model, lambda: self._client.chat(model=model, messages=messages, keep_alive=self.keep_alive, **kwargs))
+            self._record_metrics(span, response)
+            return response
+
+    def _stream_chat(self, *, model: str, messages: list[dict], **kwargs) -> Iterator[Any]:
+        # The slot is held until the stream is fully consumed (or closed); only the request itself is retried
+        with self.tracer.span(f'ollama:{model}', stream=True) as span, self.slot(model):
+            def start() -> tuple[Any, Iterator[Any]]:
+                parts = iter(self._client.chat(model=model, messages=messages, keep_alive=self.keep_alive, stream=True, **kwargs))
+                return next(parts, None), parts
+            first, parts = self._with_retries(model, start)
+            try:
+                if first is not None:
+                    if getattr(first, 'done', False): self._record_metrics(span, first)
+                    yield first
+                for part in parts:
+                    if getattr(part, 'done', False): self._record_metrics(span, part)
+                    yield part
+            finally:
+                # Closing the stream early (e.g. a cancelled request) closes the connection, which stops Ollama generating
+                close = getattr(parts, 'close', None)
+                if close: close()
+
+    def _cancellable(self, parts: Iterator[Any], cancel: threading.Event) -> Iterator[Any]:
+        # The stream is read in a thread of its own, so the caller stops as soon as cancel is set, even while the
+        # model is still evaluating the prompt: Ollama sends nothing, not even the response headers, before the first
+        # part. The reader thread then closes the stream, and with it the connection and the slot, on the next part.
+        received: queue.Queue = queue.Queue()
+        stopped = threading.Event()
+
+        def read() -> None:
+            error: BaseException | None = None
+            try:
+                for part in parts:
+                    if stopped.is_set(): break
+                    received.put(('part', part))
+            except BaseException as e:
+                error = e
+            finally:
+                parts.close()  # pyright: ignore[reportAttributeAccessIssue]  # a generator, only touched by this thread
+                received.put(('end', error))
+
+        threading.Thread(target=contextvars.copy_context().run, args=(read,), name='stream-reader', daemon=True).start()
+        try:
+            while not cancel.is_set():
+                try:
+                    kind, payload = received.get(timeout=self._CANCEL_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+                if kind == 'end':
+                    if payload is not None: raise payload
+                    return
+                yield payload
+        finally:
+            stopped.set()
+
+    def warm_up(self, models: list[str]) -> list[threading.Thread]:
+        # Loads the models into memory in the background, so the first real requests don't pay for it
+        def load(model: str) -> None:
+            try:
+                start = time.perf_counter()
+                with self.slot(model):
+                    self._with_retries(model, lambda: self._client.generate(model=model, prompt='', keep_alive=self.keep_alive))
+                self.logger.debug(f'Warmed up {model} in {time.perf_counter() - start:.1f}s')
+            except Exception as e:
+                self.logger.warning(f'Failed warming up {model} | {e.__class__.__name__}: {e}')
+
+        threads = [threading.Thread(target=load, args=(model,), name=f'warm-up:{model}', daemon=True) for model in models]
+        for thread in threads:
+            thread.start()
+        return threads
@@ -1,43 +1,157 @@
-import ollama
-from bs4 import BeautifulSoup
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
 from .types_ import Article
 from .logger import Logger
-from .utils import dedent
+from .utils import dedent, estimate_tokens, lazy_import
+from .chunking import split_paragraphs
+from .model_gateway import ModelGateway
+from .tracing import Tracer
+from .memo_store import MemoStore
+from .content_extractor import ContentExtractor
+
+bs4 = lazy_import('bs4')
 
 
 
 
 class NewsPageScraper:
-    def __init__(self) -> None:
+    MODEL = 'llama3.1'
+    OPTIONS = {'temperature': 0.3}
+    PROMPT = dedent(
+        """
+        ## Raw Text
+        {text}
+
+        ## Task
+        The raw text is scraped from webpage, which contains an article. 
+        Clean it, and return the article formatted as Markdown. 
+        Return nothing but the article content - avoid any ads, subscription requests or engagement to follow/like/share/comment.
+        Do NOT add any prefix text like "Here's the clean text" - just write the text!
+        """)
+    CHUNK_PROMPT = dedent(
+        """
+        ## Raw Text
+        {text}
+
+        ## Task
+        The raw text is a part of a longer text, scraped from webpage which contains an article. 
+        Clean it, and return this part of the article formatted as Markdown. 
+        Return nothing but the article content - avoid any ads, subscription requests or engagement to follow/like/share/comment.
+        Do NOT summarize, do NOT add titles that are not in the text, and do NOT add any prefix text like "Here's the clean text" - just write the text!
+        """)
+    CHUNK_SEPARATOR = '\n\n'
+
+    def __init__(self, 
+                 *, 
+                 memo: bool = True, 
+                 extract_content: bool = True,
+                 chunk_tokens: int = 1500,
+                 chunk_parallelism: int = 2,
+                 stream: bool = False,
+                 on_text: Callable[[str, str], None] | None = None
+                 ) -> None:
         self.logger = Logger()
+        self.gateway = ModelGateway()
+        self.tracer = Tracer()
+        self.chunk_tokens = chunk_tokens
+        self.chunk_parallelism = chunk_parallelism
+        self.stream = stream  # cleans with stream_clean_text, passing on_text(url, text) each piece as it's generated
+        self.on_text = on_text
+        self.memo = MemoStore(namespace='clean_text') if memo else None
+        self.extractor = ContentExtractor() if extract_content else None
+        self.raw_tokens = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def _clean_chunk(self, raw_text: str, *, prompt: str, stream: bool = False) -> Iterator[str]:
+        # Yields the cleaned text, piece by piece as the LLM generates it if streaming, or all at once
+        memo_key = MemoStore.key(raw_text, self.MODEL, prompt, self.OPTIONS)
+        if self.memo:
+            cached = self.memo.get(memo_key)
+            if cached is not None:
+                self.logger.debug('Clean text found in memo store, skipping LLM call')
+                yield cached
+                return
+        messages = [{'role': 'user', 'content': prompt.format(text=raw_text)}]
+        if stream:
+            pieces: list[str] = []
+            for part in self.gateway.chat(model=self.MODEL, options=self.OPTIONS, messages=messages, stream=True):
+                piece = part['message']['content']
+                pieces.append(piece)
+                yield piece
+            text = ''.join(pieces)
+        else:
+            text = self.gateway.chat(model=self.MODEL, options=self.OPTIONS, messages=messages)['message']['content']
+            yield text
+        if self.memo:
+            self.memo.put(memo_key, text)
+
+    def _clean_whole_chunk(self, raw_text: str) -> str:
+        return ''.join(self._clean_chunk(raw_text, prompt=self.CHUNK_PROMPT))
+
+    def _split(self, raw_text: str) -> list[str]:
+        chunks = split_paragraphs(raw_text, token_budget=self.chunk_tokens)
+        if len(chunks) > 1:
+            self.logger.debug(f'Long text ({estimate_tokens(raw_text)} tokens), cleaning it in {len(chunks)} chunks')
+        return chunks
+
+    def stream_clean_text(self, raw_text: str) -> Iterator[str]:
+        # The first chunk is streamed as it's generated, while the rest are cleaned concurrently in the background
+        chunks = self._split(raw_text)
+        if len(chunks) == 1:
+            yield from self._clean_chunk(raw_text, prompt=self.PROMPT, stream=True)
+            return
+        # The stream of the first chunk is one of the chunk_parallelism requests, so it doesn't queue behind the rest
+        with ThreadPoolExecutor(max_workers=max(1, self.chunk_parallelism - 1)) as executor:
+            futures = [executor.submit(self._clean_whole_chunk, chunk) for chunk in chunks[1:]]
+            yield from self._clean_chunk(chunks[0], prompt=self.CHUNK_PROMPT, stream=True)
+            for future in futures:
+                yield self.CHUNK_SEPARATOR
+                yield future.result()
+
+    def _get_streamed_clean_text(self, raw_text: str, url: str) -> str:
+        pieces: list[str] = []
+        with self.tracer.span('stream_clean_text') as span:
+            start = time.perf_counter()
+            for piece in self.stream_clean_text(raw_text):
+                if not pieces: span.set(first_text_seconds=time.perf_counter() - start)
+                pieces.append(piece)
+                if self.on_text: self.on_text(url, piece)
+        return ''.join(pieces)
 
     def _get_clean_text(self, raw_text: str) -> str:
-        prompt = dedent(
-            """
-            ## Raw Text
-            {text}
-
-            ## Task
-            The raw text is scraped from webpage, which contains an article. 
-            Clean it, and return the article formatted as Markdown. 
-            Return nothing but the article content - avoid any ads, subscription requests or engagement to follow/like/share/comment.
-            Do NOT add any prefix text like "Here's the clean text" - just write the text!
-            """)
-        text = ollama.chat(
-            model='llama3.1',
-            options={'temperature': 0.3},
-            messages=[{'role': 'user', 'content': prompt.format(text=raw_text)}],
-        )['message']['content']
-        return text
+        chunks = self._split(raw_text)
+        if len(chunks) == 1:
+            return ''.join(self._clean_chunk(raw_text, prompt=self.PROMPT))
+        with ThreadPoolExecutor(max_workers=self.chunk_parallelism) as executor:
+            cleaned_chunks = list(executor.map(self._clean_whole_chunk, chunks))
+        return self.CHUNK_SEPARATOR.join(cleaned_chunks)
     
     def from_html(self, html: str, url: str) -> Article:
-        soup = BeautifulSoup(html, 'html.parser')
-        title = soup.title.string if soup.title else None
-        raw_text = soup.get_text()
-        text = self._get_clean_text(raw_text)
+        with self.tracer.span('from_html', url=url):
+            return self._from_html(html, url)
+
+    def _from_html(self, html: str, url: str) -> Article:
+        if self.extractor:
+            with self.tracer.span('extract_content') as span:
+                content = self.extractor.extract(html)
+                span.set(raw_tokens=content['raw_tokens'], extracted_tokens=content['tokens'])
+            title, raw_text = content['title'], content['text']
+            saved = content['raw_tokens'] - content['tokens']
+            self.logger.debug(f"Content extraction saved {saved}/{content['raw_tokens']} tokens ({saved / max(content['raw_tokens'], 1):.0%}): {url}")
+            with self._lock:
+                self.raw_tokens += content['raw_tokens']
+                self.tokens += content['tokens']
+        else:
+            soup = bs4.BeautifulSoup(html, 'html.parser')
+            title = soup.title.string if soup.title else None
+            raw_text = soup.get_text()
+        text = self._get_streamed_clean_text(raw_text, url) if self.stream else self._get_clean_text(raw_text)
         return Article(
             url=url,
             title=title or '',
             text=text
         )
-    
\ No newline at end of file
+    
@@ -0,0 +1,170 @@
+import queue
+import itertools
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import Future
+from typing import Any, TYPE_CHECKING
+from .logger import Logger
+from .florence import Florence
+from .model_gateway import ModelGateway
+from .tracing import Tracer
+from .types_ import OcrOptions
+from .utils import lazy_import
+
+if TYPE_CHECKING:
+    from PIL.Image import Image as PillowImage
+
+np = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+
+_STOP = None  # sent to each worker on shutdown
+
+
+def _worker_main(requests: multiprocessing.Queue, results: multiprocessing.Queue, max_batch: int, options: OcrOptions) -> None:
+    # Runs in the worker process: keeps Florence loaded, and runs the requests waiting together as one batch
+    florence = Florence(**options)
+    florence.load()
+    results.put(('ready', None, None))
+    while True:
+        batch = [requests.get()]
+        while batch[-1] is not _STOP and len(batch) < max_batch:
+            try:
+                batch.append(requests.get_nowait())
+            except queue.Empty:
+                break
+        stop = batch[-1] is _STOP
+        if stop: batch.pop()
+        if batch:
+            request_ids: list[int] = []
+            images: list['PillowImage'] = []
+            for request_id, shm_name, shape in batch:
+                shm = shared_memory.SharedMemory(name=shm_name)
+                try:
+                    # Copied out of the shared memory, which the parent unlinks once the result is sent
+                    images.append(Image.fromarray(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf).copy()))
+                finally:
+                    shm.close()
+                request_ids.append(request_id)
+            try:
+                predictions = florence.ocr_with_region_batch(images)
+                for request_id, prediction in zip(request_ids, predictions):
+                    results.put(('result', request_id, {'labels': list(prediction['labels']),
+                                                        'quad_boxes': [list(map(float, box)) for box in prediction['quad_boxes']]}))
+            except Exception as e:
+                for request_id in request_ids:
+                    results.put(('error', request_id, f'{e.__class__.__name__}: {e}'))
+        if stop: return
+
+
+class OcrWorkerPool:
+    # Florence in dedicated processes, so inference neither competes with the browser thread for the GIL nor
+    # stalls it. Frames are passed as raw pixels through shared memory, and each worker runs the requests
+    # queued together as one batch. ocr_with_region() matches Florence's, so the reader can use either, and takes
+    # a slot of Florence in the ModelGateway like it, whose concurrency for Florence should be the pool's capacity.
+    _CANCEL_POLL_SECONDS = 0.05
+
+    def __init__(self, *, workers: int = 1, max_batch: int = 4, options: OcrOptions | None = None) -> None:
+        self.logger = Logger()
+        self.tracer = Tracer()
+        self.gateway = ModelGateway()
+        self.workers = workers
+        self.max_batch = max_batch
+        self.options: OcrOptions = options or {}  # for the Florence of each worker
+        self._context = multiprocessing.get_context('spawn')  # forking a process holding Playwright and torch threads isn't safe
+        self._requests: multiprocessing.Queue = self._context.Queue()
+        self._results: multiprocessing.Queue = self._context.Queue()
+        self._processes: list[Any] = []
+        self._pending: dict[int, tuple[Future, shared_memory.SharedMemory]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._collector: threading.Thread | None = None
+        self._closed: str | None = None  # why requests are no longer accepted
+
+    @property
+    def capacity(self) -> int:
+        # Requests which can be processed at once
+        return self.workers * self.max_batch
+
+    def __enter__(self) -> 'OcrWorkerPool':
+        for i in range(self.workers):
+            process = self._context.Process(target=_worker_main, args=(self._requests, self._results, self.max_batch, self.options),
+                                            name=f'ocr-worker-{i}', daemon=True)
+            process.start()
+            self._processes.append(process)
+        self._collector = threading.Thread(target=self._collect, name='ocr-results', daemon=True)
+        self._collector.start()
+        self.logger.info(f'Started {self.workers} OCR worker processes')
+        return self
+
+    def __exit__(self, *args) -> None:
+        for _ in self._processes:
+            self._requests.put(_STOP)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive(): process.terminate()
+        self._fail_pending('OCR worker pool was shut down')
+        if self._collector: self._collector.join(timeout=2)
+
+    def _collect(self) -> None:
+        # Resolves the futures as results arrive; fails them all if every worker died
+        while True:
+            try:
+                kind, request_id, payload = self._results.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in self._processes):
+                    self._fail_pending('All OCR worker processes exited')
+                    return
+                continue
+            if kind == 'ready':
+                self.logger.debug('OCR worker ready')
+                continue
+            with self._lock:
+                future, shm = self._pending.pop(request_id, (None, None))
+            if shm: self._release(shm)
+            if future is None or future.cancelled(): continue
+            if kind == 'result': future.set_result(payload)
+            else: future.set_exception(RuntimeError(f'OCR worker failed | {payload}'))
+
+    def _release(self, shm: shared_memory.SharedMemory) -> None:
+        shm.close()
+        shm.unlink()
+
+    def _fail_pending(self, reason: str) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._closed = self._closed or reason
+        for future, shm in pending.values():
+            self._release(shm)
+            if not future.done(): future.set_exception(RuntimeError(reason))
+
+    def submit(self, image: 'PillowImage') -> 'Future[dict]':
+        pixels = np.asarray(image.convert('RGB'), dtype=np.uint8)
+        shm = shared_memory.SharedMemory(create=True, size=pixels.nbytes)
+        np.ndarray(pixels.shape, dtype=np.uint8, buffer=shm.buf)[:] = pixels
+        future: Future[dict] = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            if self._closed:
+                self._release(shm)
+                raise RuntimeError(self._closed)
+            self._pending[request_id] = (future, shm)
+        self._requests.put((request_id, shm.name, pixels.shape))
+        return future
+
+    def ocr_with_region(self, image: 'PillowImage', *, cancel: threading.Event | None = None) -> dict:
+        with self.tracer.span('ocr_worker'):
+            return self.gateway.run(Florence.MODEL_NAME, lambda: self._ocr_with_region(image, cancel))
+
+    def _ocr_with_region(self, image: 'PillowImage', cancel: threading.Event | None) -> dict:
+        if cancel is not None and cancel.is_set(): return {'labels': [], 'quad_boxes': []}  # cancelled while waiting for the slot
+        future = self.submit(image)
+        if cancel is None: return future.result()
+        # Once cancel is set the result isn't waited for; the worker still runs the request if it already took it
+        done = threading.Event()
+        future.add_done_callback(lambda _: done.set())
+        while not done.wait(self._CANCEL_POLL_SECONDS):
+            if cancel.is_set():
+                future.cancel()
+                return {'labels': [], 'quad_boxes': []}
+        return future.result()
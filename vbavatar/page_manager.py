@@ -0,0 +1,90 @@
+import os
+import threading
+import importlib.util
+from playwright.sync_api import BrowserContext, Page
+from .logger import Logger
+
+
+def browser_rss_bytes() -> int | None:
+    # Resident memory of the browsers: the Playwright driver processes started by this process and everything they
+    # started (Chromium and its renderers). Read with psutil if it's installed, or from /proc; None if neither is there.
+    if importlib.util.find_spec('psutil'):
+        import psutil
+        total = 0
+        for child in psutil.Process().children():
+            try:
+                if not any('playwright' in part for part in child.cmdline()): continue  # e.g. OCR worker processes
+                processes = [child] + child.children(recursive=True)
+            except psutil.Error:
+                continue
+            for process in processes:
+                try:
+                    total += process.memory_info().rss
+                except psutil.Error:
+                    pass
+        return total
+
+    if not os.path.isdir('/proc'):
+        return None
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit(): continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])  # the process name, in parentheses, may contain spaces
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pending: list[int] = []
+    for pid in children.get(os.getpid(), []):
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                if b'playwright' in f.read(): pending.append(pid)
+        except OSError:
+            continue
+    total = 0
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    while pending:
+        pid = pending.pop()
+        pending.extend(children.get(pid, []))
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+class PageManager:
+    # Article tabs the sync engine opens by clicking are closed as soon as their HTML is taken. Tabs left open
+    # otherwise (e.g. clicks which never got to an article) are closed, oldest first, so no more than max_tabs
+    # are open besides the Google News page. Also samples the memory of the browsers, to report its peak.
+    def __init__(self, *, max_tabs: int = 4) -> None:
+        self.logger = Logger()
+        self.max_tabs = max(1, max_tabs)
+        self.closed = 0
+        self.peak_rss: int | None = None
+        self._lock = threading.Lock()
+
+    def close(self, page: Page) -> None:
+        try:
+            page.close()
+        except Exception as e:
+            self.logger.debug(f'Failed closing {page.url} | {e.__class__.__name__}: {e}')
+        with self._lock:
+            self.closed += 1
+
+    def limit(self, context: BrowserContext, *, keep: Page) -> None:
+        # Makes room for one more tab; context.pages is in the order the pages were opened
+        pages = [page for page in context.pages if page is not keep]
+        for page in pages[:max(0, len(pages) - self.max_tabs + 1)]:
+            self.logger.debug(f'Closing tab left open: {page.url}')
+            self.close(page)
+
+    def sample_rss(self) -> int | None:
+        rss = browser_rss_bytes()
+        if rss is not None:
+            with self._lock:
+                self.peak_rss = max(self.peak_rss or 0, rss)
+            self.logger.debug(f'Browser RSS: {rss / 2**20:.0f}MB')
+        return rss
@@ -0,0 +1,140 @@
+import queue
+import threading
+import contextvars
+from typing import Any, Callable, Iterator
+from .logger import Logger
+from .tracing import Tracer
+
+
+_DONE = object()  # end-of-stream marker, travels through the queues after the last item
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable[[Any], Any], *, workers: int = 1) -> None:
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+
+class Pipeline:
+    # Runs stages in background threads, connected by bounded queues.
+    # A stage's function gets one item and returns the item to pass on, or None to drop it.
+    # The output queue is unbounded, as it is drained by the calling thread, which also feeds the input.
+    _POLL_SECONDS = 0.1
+
+    def __init__(self, stages: list[Stage], *, maxsize: int = 2, name: str = 'pipeline') -> None:
+        self.logger = Logger()
+        self.tracer = Tracer()
+        self.name = name
+        self._stages = stages
+        self._queues: list[queue.Queue] = [queue.Queue(maxsize=maxsize) for _ in stages] + [queue.Queue()]
+        self._max_depths = [0] * len(self._queues)
+        self._running_workers = [stage.workers for stage in stages]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._closed = False
+        self._finished = False
+
+    @property
+    def _queue_names(self) -> list[str]:
+        return [stage.name for stage in self._stages] + ['output']
+
+    def depths(self) -> dict[str, int]:
+        return {name: q.qsize() for name, q in zip(self._queue_names, self._queues)}
+
+    def max_depths(self) -> dict[str, int]:
+        return dict(zip(self._queue_names, self._max_depths))
+
+    def _record_depth(self, i: int) -> None:
+        depth = self._queues[i].qsize()
+        with self._lock:
+            self._max_depths[i] = max(self._max_depths[i], depth)
+
+    def _put(self, i: int, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queues[i].put(item, timeout=self._POLL_SECONDS)
+                self._record_depth(i)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _work(self, i: int) -> None:
+        stage = self._stages[i]
+        inbox = self._queues[i]
+        while not self._stop.is_set():
+            try:
+                item = inbox.get(timeout=self._POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                with self._lock:
+                    self._running_workers[i] -= 1
+                    last_worker = self._running_workers[i] == 0
+                # Siblings of this stage need to see the marker too; only the last one passes it on
+                self._put(i + 1 if last_worker else i, _DONE)
+                return
+            try:
+                with self.tracer.span(f'stage:{stage.name}'):
+                    result = stage.func(item)
+            except Exception as e:
+                self.logger.error(f'[{self.name}:{stage.name}] {e.__class__.__name__}: {e}', stack_lines=10)
+                continue
+            if result is not None:
+                self._put(i + 1, result)
+
+    def start(self) -> None:
+        for i, stage in enumerate(self._stages):
+            for w in range(stage.workers):
+                # Each thread runs in a copy of the creating thread's context, so logs keep its topic
+                context = contextvars.copy_context()
+                thread = threading.Thread(target=context.run, args=(self._work, i), name=f'{self.name}:{stage.name}:{w}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def put(self, item: Any, *, timeout: float | None = None) -> None:
+        # Raises queue.Full if the first stage is still saturated after `timeout` seconds
+        self._queues[0].put(item, timeout=timeout)
+        self._record_depth(0)
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._put(0, _DONE)
+
+    def ready(self) -> Iterator[Any]:
+        # Yields whatever already left the last stage, without blocking
+        while not self._finished:
+            try:
+                item = self._queues[-1].get_nowait()
+            except queue.Empty:
+                return
+            if item is _DONE:
+                self._finished = True
+                return
+            yield item
+
+    def drain(self) -> Iterator[Any]:
+        # Closes the pipeline and yields all remaining outputs, as they come
+        self.close()
+        while not self._finished:
+            item = self._queues[-1].get()
+            if item is _DONE:
+                self._finished = True
+                return
+            yield item
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+
+    def __enter__(self) -> 'Pipeline':
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
@@ -0,0 +1,103 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Any, TYPE_CHECKING
+from .logger import Logger
+from .utils import lazy_import
+
+if TYPE_CHECKING:
+    from PIL.Image import Image as PillowImage
+    from .screenshot import Screenshot
+
+Image = lazy_import('PIL.Image')
+
+MANIFEST_FILE_NAME = 'manifest.json'
+
+
+def pixels_hash(image: 'PillowImage') -> str:
+    # Identifies a screenshot by its decoded pixels, regardless of how it was encoded or where it was stored
+    return hashlib.sha1(image.convert('RGB').tobytes()).hexdigest()
+
+
+class FixtureRecorder:
+    # Records what a run saw - screenshots, VLM titles, OCR outputs and article pages - into a fixture bundle,
+    # which benchmarks/replay.py replays offline against stub servers
+    def __init__(self, directory: str) -> None:
+        self.logger = Logger()
+        self.directory = directory
+        self._frames: dict[str, dict[str, Any]] = {}  # screenshot file name -> frame record
+        self._pages: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+        for dr in [os.path.join(directory, 'frames'), os.path.join(directory, 'pages')]:
+            os.makedirs(dr, exist_ok=True)
+
+    def _frame(self, screenshot: 'Screenshot') -> dict[str, Any]:
+        return self._frames.setdefault(screenshot.name, {'titles': None, 'ocr': None})
+
+    def record_frame(self, topic: str, scroll: int, screenshot: 'Screenshot') -> None:
+        with open(os.path.join(self.directory, 'frames', screenshot.name), 'wb') as f:
+            f.write(screenshot.png)
+        with self._lock:
+            self._frame(screenshot).update(topic=topic, scroll=scroll, image=f'frames/{screenshot.name}')
+
+    def record_titles(self, screenshot: 'Screenshot', titles: list[str]) -> None:
+        with self._lock:
+            self._frame(screenshot)['titles'] = titles
+
+    def record_ocr(self, screenshot: 'Screenshot', prediction: dict) -> None:
+        with self._lock:
+            self._frame(screenshot)['ocr'] = {'labels': list(prediction['labels']),
+                                            'quad_boxes': [list(map(float, box)) for box in prediction['quad_boxes']]}
+
+    def record_page(self, url: str, html: str, *, source: str | None = None) -> None:
+        with self._lock:
+            file_name = f'pages/{len(self._pages):04d}.html'
+            self._pages.append({'url': url, 'source': source, 'file': file_name})
+        with open(os.path.join(self.directory, file_name), 'w', encoding='utf8') as f:
+            f.write(html)
+
+    def save(self) -> None:
+        with self._lock:
+            frames = [frame for frame in self._frames.values() if 'image' in frame]
+            manifest = {'version': 1, 'frames': frames, 'pages': list(self._pages)}
+        with open(os.path.join(self.directory, MANIFEST_FILE_NAME), 'w') as f:
+            json.dump(manifest, f, indent=1)
+        self.logger.info(f'Recorded {len(frames)} screenshots and {len(manifest["pages"])} pages to: {self.directory}')
+
+
+class ReplayBundle:
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE_NAME)) as f:
+            manifest = json.load(f)
+        self.frames: list[dict[str, Any]] = sorted(manifest['frames'], key=lambda fr: (fr['topic'], fr['scroll']))
+        self.pages: list[dict[str, Any]] = manifest['pages']
+        self._by_pixels: dict[str, dict[str, Any]] | None = None
+
+    def path(self, relative_path: str) -> str:
+        return os.path.join(self.directory, relative_path)
+
+    def html(self, page: dict[str, Any]) -> str:
+        with open(self.path(page['file']), encoding='utf8') as f:
+            return f.read()
+
+    def frame_of(self, image: 'PillowImage') -> dict[str, Any] | None:
+        if self._by_pixels is None:
+            self._by_pixels = {pixels_hash(Image.open(self.path(fr['image']))): fr for fr in self.frames}
+        return self._by_pixels.get(pixels_hash(image))
+
+
+class ReplayOcr:
+    # Stands in for Florence, answering with the OCR outputs recorded for the same screenshot, after a simulated latency
+    def __init__(self, bundle: ReplayBundle, *, latency: float = 0) -> None:
+        self.bundle = bundle
+        self.latency = latency
+
+    def ocr_with_region(self, image: 'PillowImage', *, cancel: threading.Event | None = None) -> dict:
+        if (cancel or threading.Event()).wait(self.latency):
+            return {'labels': [], 'quad_boxes': []}
+        frame = self.bundle.frame_of(image)
+        if frame is None or frame['ocr'] is None:
+            return {'labels': [], 'quad_boxes': []}
+        return frame['ocr']
@@ -0,0 +1,79 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+from .browser import Browser
+from .google_news_reader import GoogleNewsReader
+from .logger import Logger
+from .tracing import Tracer
+from .types_ import Article
+
+_DONE = object()  # sent by each topic once it's fully read
+
+
+class TopicScheduler:
+    # Reads several topics at once. Sync Playwright is bound to the thread that started it, so each topic runs in
+    # a thread with a browser of its own, while the models, the fetcher and the URL index are shared by the reader
+    # (with inference capped by the ModelGateway). Articles are yielded as soon as they're cleaned, in any order.
+    def __init__(self, reader: GoogleNewsReader, *, parallelism: int = 3, headless: bool = False, block_requests: bool = False) -> None:
+        self.logger = Logger()
+        self.tracer = Tracer()
+        self.reader = reader
+        self.parallelism = max(1, parallelism)
+        self.headless = headless
+        self.block_requests = block_requests  # on the article pages the sync engine opens by clicking
+
+    def _read(self,
+              topic: str,
+              url: str,
+              results: queue.Queue,
+              stop: threading.Event,
+              **kwargs
+              ) -> None:
+        try:
+            if stop.is_set(): return
+            browser = Browser(headless=self.headless, block_requests=self.block_requests)
+            with self.tracer.span('topic', topic=topic), self.logger.context(topic=topic), browser as context:
+                for article in self.reader._read_topic(topic, url, browser_context=context, stop=stop, **kwargs):
+                    results.put((topic, article))
+        except Exception as e:
+            self.logger.error(f'Failed reading {topic} | {e.__class__.__name__}: {e}', stack_lines=10)
+        finally:
+            results.put((topic, _DONE))
+
+    def iter_news(self,
+                  *,
+                  max_threads: int | None = 3,
+                  scrolls: int = 6,
+                  queue_size: int = 2,
+                  skip_urls: Iterable[str] = ()
+                  ) -> Iterator[tuple[str, Article]]:
+        topics = self.reader.urls
+        skip_urls = set(skip_urls)
+        results: queue.Queue = queue.Queue()
+        stop = threading.Event()  # set if the caller stops iterating early
+        self.logger.info(f'Reading {len(topics)} topics, {min(self.parallelism, len(topics))} at a time: {", ".join(topics)}')
+        with ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix='topic') as executor:
+            for topic, url in topics.items():
+                executor.submit(self._read, topic, url, results, stop,
+                                max_threads=max_threads, scrolls=scrolls, queue_size=queue_size, skip_urls=skip_urls)
+            remaining = len(topics)
+            try:
+                while remaining:
+                    topic, article = results.get()
+                    if article is _DONE: remaining -= 1
+                    else: yield topic, article
+            finally:
+                stop.set()
+        self.reader._log_summary()
+
+    def get_news(self,
+                 *,
+                 max_threads: int | None = 3,
+                 scrolls: int = 6,
+                 queue_size: int = 2
+                 ) -> dict[str, list[Article]]:
+        output: dict[str, list[Article]] = {k: [] for k in self.reader.urls}
+        for k, article in self.iter_news(max_threads=max_threads, scrolls=scrolls, queue_size=queue_size):
+            output[k].append(article)
+        return output
@@ -0,0 +1,42 @@
+import io
+import os
+import threading
+from typing import TYPE_CHECKING
+from .utils import lazy_import
+
+if TYPE_CHECKING:
+    from PIL.Image import Image as PillowImage
+
+Image = lazy_import('PIL.Image')
+
+
+class Screenshot:
+    # A screenshot held in memory: the PNG bytes Playwright returns are sent to the VLM as they are, and decoded
+    # only once, on first use, for fingerprinting and OCR. path is where it was written to, if it was.
+    def __init__(self, png: bytes, *, name: str, path: str | None = None) -> None:
+        self.png = png
+        self.name = name
+        self.path = path
+        self._image: 'PillowImage | None' = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str) -> 'Screenshot':
+        with open(path, 'rb') as f:
+            png = f.read()
+        return cls(png, name=os.path.basename(path), path=path)
+
+    @property
+    def image(self) -> 'PillowImage':
+        # Shared by all stages - copy it before drawing on it
+        with self._lock:
+            if self._image is None:
+                self._image = Image.open(io.BytesIO(self.png)).convert('RGB')
+            return self._image
+
+    @property
+    def stem(self) -> str:
+        return os.path.splitext(self.name)[0]
+
+    def __repr__(self) -> str:
+        return self.path or self.name
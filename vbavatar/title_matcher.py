@@ -0,0 +1,111 @@
+import re
+from collections import defaultdict
+from .types_ import TitleMatch
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def bbox_center(coords: list[float]) -> tuple[int, int]:
+    # coords: [x1, y1, x2, y2, x3, y3, x4, y4]
+    center_x = sum(coords[0::2]) / 4
+    center_y = sum(coords[1::2]) / 4
+    return int(round(center_x)), int(round(center_y))
+
+
+class _Candidate:
+    # One or more vertically adjacent OCR boxes, which together may hold a headline
+    def __init__(self, box_ids: list[int], text: str, point: tuple[int, int]) -> None:
+        self.box_ids = box_ids
+        self.text = text
+        self.tokens = set(tokenize(text))
+        self.point = point
+
+
+class TitleMatcher:
+    def __init__(self,
+                 *,
+                 min_confidence: float = 0.5,
+                 max_lines: int = 3,
+                 max_line_gap: float = 0.75,
+                 max_indent: float = 1.0
+                 ) -> None:
+        # max_line_gap and max_indent are relative to the height of the upper line
+        self.min_confidence = min_confidence
+        self.max_lines = max_lines
+        self.max_line_gap = max_line_gap
+        self.max_indent = max_indent
+
+    def _rect(self, bbox: list[float]) -> tuple[float, float, float, float]:
+        xs, ys = bbox[0::2], bbox[1::2]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def _next_lines(self, rects: list[tuple[float, float, float, float]]) -> dict[int, int]:
+        # Maps each box to the box right below it, if it looks like the continuation of the same text block
+        order = sorted(range(len(rects)), key=lambda i: rects[i][1])
+        next_line: dict[int, int] = {}
+        for pos, i in enumerate(order):
+            left, _, _, bottom = rects[i]
+            height = rects[i][3] - rects[i][1]
+            for j in order[pos + 1:]:
+                j_left, j_top, _, _ = rects[j]
+                if j_top - bottom > self.max_line_gap * height:
+                    break  # sorted by top, so all the next boxes are even lower
+                if j_top >= bottom - 0.5 * height and abs(j_left - left) <= self.max_indent * height:
+                    next_line[i] = j
+                    break
+        return next_line
+
+    def _candidates(self, texts_and_bboxes: list[tuple[str, list[float]]]) -> list[_Candidate]:
+        rects = [self._rect(bbox) for _, bbox in texts_and_bboxes]
+        next_line = self._next_lines(rects)
+        candidates: list[_Candidate] = []
+        for i, (text, bbox) in enumerate(texts_and_bboxes):
+            point = bbox_center(bbox)  # clicking the first line of a headline
+            box_ids, texts = [i], [text]
+            candidates.append(_Candidate(list(box_ids), text, point))
+            while len(box_ids) < self.max_lines and box_ids[-1] in next_line:
+                j = next_line[box_ids[-1]]
+                box_ids.append(j)
+                texts.append(texts_and_bboxes[j][0])
+                candidates.append(_Candidate(list(box_ids), ' '.join(texts), point))
+        return candidates
+
+    def _score(self, title_tokens: set[str], candidate: _Candidate) -> float:
+        # Dice coefficient over tokens: a single line of a two-line headline scores lower than both lines merged
+        if not title_tokens or not candidate.tokens:
+            return 0.0
+        return 2 * len(title_tokens & candidate.tokens) / (len(title_tokens) + len(candidate.tokens))
+
+    def match(self, titles: list[str], texts_and_bboxes: list[tuple[str, list[float]]]) -> list[TitleMatch]:
+        candidates = self._candidates(texts_and_bboxes)
+        index: dict[str, list[int]] = defaultdict(list)  # token -> candidates containing it
+        for c, candidate in enumerate(candidates):
+            for token in candidate.tokens:
+                index[token].append(c)
+
+        scored: list[tuple[float, int, int]] = []  # (confidence, title index, candidate index)
+        for t, title in enumerate(titles):
+            title_tokens = set(tokenize(title))
+            related = {c for token in title_tokens for c in index.get(token, ())}
+            for c in related:
+                confidence = self._score(title_tokens, candidates[c])
+                if confidence >= self.min_confidence:
+                    scored.append((confidence, t, c))
+
+        # Greedy assignment, best matches first, so each title and each OCR box is used at most once
+        scored.sort(key=lambda s: s[0], reverse=True)
+        matched_titles: set[int] = set()
+        used_boxes: set[int] = set()
+        matches: dict[int, TitleMatch] = {}
+        for confidence, t, c in scored:
+            candidate = candidates[c]
+            if t in matched_titles or used_boxes.intersection(candidate.box_ids):
+                continue
+            matched_titles.add(t)
+            used_boxes.update(candidate.box_ids)
+            matches[t] = TitleMatch(title=titles[t], text=candidate.text, point=candidate.point, confidence=confidence)
+        return [matches[t] for t in sorted(matches)]
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import threading
+from typing import Any
+from .singleton_metaclass import SingletonMeta
+
+
+class Span:
+    __slots__ = ('name', 'start_ns', 'end_ns', 'thread_id', 'attrs', '_tracer')
+
+    def __init__(self, tracer: 'Tracer', name: str, attrs: dict[str, Any]) -> None:
+        self._tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.thread_id = threading.get_native_id()
+        self.start_ns = 0
+        self.end_ns = 0
+
+    @property
+    def seconds(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> 'Span':
+        self._tracer._push(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, *args) -> None:
+        self.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self._tracer._pop(self)
+
+
+class _NoopSpan:
+    # Returned while tracing is off, so instrumented code costs a single attribute check
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer(metaclass=SingletonMeta):
+    def __init__(self) -> None:
+        if getattr(self, "_initialized", False):
+            return
+        else:
+            super().__init__()
+            self._initialized = True
+            self.enabled = False
+            self._spans: list[Span] = []
+            self._lock = threading.Lock()
+            self._local = threading.local()
+            self._origin_ns = time.perf_counter_ns()
+            self._thread_names: dict[int, str] = {}
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def span(self, name: str, **attrs: Any) -> Span | _NoopSpan:
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, attrs)
+
+    def _push(self, span: Span) -> None:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+            with self._lock:
+                self._thread_names[span.thread_id] = threading.current_thread().name
+        self._local.stack.append(span)
+
+    def _pop(self, span: Span) -> None:
+        stack: list[Span] = self._local.stack
+        if stack and stack[-1] is span:
+            stack.pop()
+        with self._lock:
+            self._spans.append(span)
+
+    @property
+    def spans(self) -> list[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def export_chrome_trace(self, path: str) -> None:
+        # Trace Event Format, viewable in chrome://tracing or https://ui.perfetto.dev
+        pid = os.getpid()
+        events: list[dict[str, Any]] = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in self._thread_names.items()
+        ]
+        for span in self.spans:
+            events.append({
+                'name': span.name,
+                'ph': 'X',
+                'ts': (span.start_ns - self._origin_ns) / 1000,
+                'dur': (span.end_ns - span.start_ns) / 1000,
+                'pid': pid,
+                'tid': span.thread_id,
+                'args': {k: v if isinstance(v, (int, float, str, bool)) or v is None else str(v) for k, v in span.attrs.items()},
+            })
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def summary(self) -> list[dict[str, Any]]:
+        by_name: dict[str, list[Span]] = {}
+        for span in self.spans:
+            by_name.setdefault(span.name, []).append(span)
+        rows: list[dict[str, Any]] = []
+        for name, spans in by_name.items():
+            seconds = sorted(s.seconds for s in spans)
+            row: dict[str, Any] = {
+                'name': name,
+                'count': len(seconds),
+                'total_s': sum(seconds),
+                'mean_s': sum(seconds) / len(seconds),
+                'p50_s': seconds[len(seconds) // 2],
+                'p95_s': seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))],
+                'max_s': seconds[-1],
+            }
+            # Numeric attributes (token counts, durations reported by the models) are summed per span name
+            for span in spans:
+                for k, v in span.attrs.items():
+                    if isinstance(v, (int, float)) and not isinstance(v, bool):
+                        row[k] = row.get(k, 0) + v
+            rows.append(row)
+        rows.sort(key=lambda r: r['total_s'], reverse=True)
+        return rows
+
+    def summary_table(self) -> str:
+        header = f"{'span':<28} {'count':>6} {'total s':>9} {'mean s':>8} {'p50 s':>8} {'p95 s':>8} {'max s':>8}  model metrics"
+        lines = [header, '-' * len(header)]
+        for row in self.summary():
+            metrics = ', '.join(f'{k}={v:,.0f}' for k, v in row.items()
+                                if k.endswith(('_count', '_tokens')))
+            metrics += ''.join(f', {k}={v:.2f}' for k, v in row.items() if k.endswith('_seconds'))
+            lines.append(f"{row['name']:<28} {row['count']:>6} {row['total_s']:>9.2f} {row['mean_s']:>8.3f} "
+                         f"{row['p50_s']:>8.3f} {row['p95_s']:>8.3f} {row['max_s']:>8.3f}  {metrics.lstrip(', ')}")
+        return '\n'.join(lines)
@@ -1,6 +1,49 @@
-from typing import TypedDict
+from typing import Literal, TypedDict, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .screenshot import Screenshot
+
 
 class Article(TypedDict):
     url: str
     title: str
     text: str
+
+
+class ScreenshotFrame(TypedDict):
+    scroll: int
+    screenshot: 'Screenshot'
+    scroll_y: float
+    fingerprint: int
+    titles: list[str]
+    points: list[tuple[int, int]]
+
+
+class TitleMatch(TypedDict):
+    title: str
+    text: str
+    point: tuple[int, int]
+    confidence: float
+
+
+class ExtractedContent(TypedDict):
+    title: str
+    text: str
+    raw_tokens: int
+    tokens: int
+
+
+class CachedArtifact(TypedDict):
+    run: str
+    name: str
+    kind: str
+    path: str
+    bytes: int
+    created: float
+
+
+class OcrOptions(TypedDict, total=False):
+    engine: Literal['eager', 'int8']
+    num_beams: int
+    max_new_tokens: int
+    threads: int | None
@@ -0,0 +1,100 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from .cache import Cache
+from .logger import Logger
+
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid', '_ga', '_gl',
+                   'ref', 'ref_src', 'ref_url', 'cmpid', 'ncid', 'ocid', 'smid', 'sr_share', 'taid', 'guccounter',
+                   'guce_referrer', 'guce_referrer_sig', 'spm', 'soc_src', 'soc_trk', 'CMP', 'amp', 'outputType', 'output'}
+TRACKING_PREFIXES = ('utm_', 'pk_', 'mtm_', 'hsa_', 'at_')
+AMP_CACHE_RE = re.compile(r'^/(?:c/)?(?:s/)?(?P<host>[^/]+)(?P<path>/.*)?$')
+
+
+def _strip_amp_path(path: str) -> str:
+    path = re.sub(r'^/amp(?=/)', '', path)                     # /amp/2024/story
+    path = re.sub(r'/amp/?$', '', path)                        # /2024/story/amp
+    path = re.sub(r'\.amp(?=\.html?$|$)', '', path)            # /2024/story.amp.html, /2024/story.amp
+    return path
+
+
+def canonicalize_url(url: str) -> str:
+    # Different URLs of the same article: tracking parameters, AMP variants, www., trailing slashes, fragments
+    parts = urlsplit(url.strip())
+    scheme = 'https' if parts.scheme in ('http', 'https') else parts.scheme
+    host = (parts.hostname or '').lower()
+    path = parts.path
+
+    # AMP caches wrap the original URL: example-com.cdn.ampproject.org/c/s/example.com/story, google.com/amp/s/example.com/story
+    if host.endswith('.cdn.ampproject.org') or (host.endswith('google.com') and path.startswith('/amp/')):
+        match = AMP_CACHE_RE.match(path[len('/amp'):] if path.startswith('/amp/') else path)
+        if match:
+            host, path = match.group('host').lower(), match.group('path') or '/'
+
+    host = re.sub(r'^(?:www|amp|m)\.', '', host)
+    if parts.port and parts.port not in (80, 443):
+        host = f'{host}:{parts.port}'
+    path = _strip_amp_path(path).rstrip('/') or '/'
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)]
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ''))
+
+
+class UrlIndex:
+    # URLs of harvested articles, persisted across runs, so the same stories aren't loaded and cleaned every run
+    _FILE_NAME = 'seen_urls.sqlite'
+
+    def __init__(self, *, ttl_seconds: float | None = 3 * 24 * 60 * 60) -> None:
+        self.logger = Logger()
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)  # guarded by self._lock
+        with self._lock, self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS seen_urls (url TEXT PRIMARY KEY, seen_at REAL NOT NULL)')
+        self.purge()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(Cache().root, self._FILE_NAME)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self)}
+
+    def _oldest_valid(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds is not None else float('-inf')
+
+    def purge(self) -> None:
+        with self._lock, self._connection:
+            removed = self._connection.execute('DELETE FROM seen_urls WHERE seen_at < ?', (self._oldest_valid(),)).rowcount
+        if removed:
+            self.logger.debug(f'URL index: purged {removed} expired URLs')
+
+    def contains(self, url: str, *, final: bool = True) -> bool:
+        # An article may be looked up by more than one URL (its Google News link, then the URL it led to). Only the
+        # last lookup is final, so a miss is counted once per article; a hit always ends the lookups of its article.
+        with self._lock:
+            row = self._connection.execute('SELECT 1 FROM seen_urls WHERE url = ? AND seen_at >= ?',
+                                           (canonicalize_url(url), self._oldest_valid())).fetchone()
+            if row: self.hits += 1
+            elif final: self.misses += 1
+        return row is not None
+
+    def add(self, *urls: str) -> None:
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO seen_urls (url, seen_at) VALUES (?, ?)',
+                                         [(canonicalize_url(url), now) for url in urls])
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM seen_urls').fetchone()[0]
@@ -1,11 +1,37 @@
-import torch
+import sys
+import importlib
+import importlib.util
+from types import ModuleType
 from urllib.parse import urlparse
 
 
+class _LazyModule(ModuleType):
+    # Stands in for a module until first attribute access, which imports it. importlib's LazyLoader would execute the
+    # module in place, but before Python 3.12 other threads touching it meanwhile see it empty; import_module holds
+    # the import lock of the module while executing it, so concurrent first uses just wait for it.
+    def __getattr__(self, attr: str):
+        return getattr(importlib.import_module(self.__name__), attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    # The module is only executed on first attribute access, keeping heavy imports out of startup
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    return _LazyModule(name)
+
+
 def domain_of_url(url: str) -> str:
     return urlparse(url).netloc
 
 
+def estimate_tokens(text: str) -> int:
+    # Rough estimate for English text with Llama tokenizers (~4 characters per token), no tokenizer needed
+    return (len(text) + 3) // 4
+
+
 def dedent(text: str) -> str:
     def count_leading_whitespaces(line: str) -> tuple[int, str]:
         stripped = line.lstrip()
@@ -31,6 +57,7 @@ def dedent(text: str) -> str:
 
 
 def torch_device() -> str:
+    import torch
     if torch.backends.mps.is_available() and torch.backends.mps.is_built():
         device = "mps"  # Apple silicon
     elif torch.cuda.is_available():